@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Precomputed activity cube over month x subgroup x category x type """
+
+# Libraries
+import os
+import json
+import argparse
+import numpy as np
+from get_index import name_aliases
+
+
+cube_name = "activity_cube.npz"
+MEASURES = ["entries", "revisions", "new_authors"]
+NO_SUBGROUP = "(none)"
+# Fields of an index entry that the cube counts
+FIELDS = ["date", "subgroup", "category", "type", "revision", "author"]
+
+
+def entry_signature(value: dict) -> str:
+    """ Return what the cube depends on of an index entry, to notice changed entries """
+    return json.dumps([value.get(x) for x in FIELDS])
+
+
+class ActivityCube:
+    """ Represents count cubes indexed by [month, subgroup, category, type]; an entry of several subgroups is
+    counted in each of them, so subgroup-free queries use totals indexed by [month, 1, category, type] """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        self.clear()
+
+    def clear(self) -> None:
+        """ Forget every counted entry """
+        self.base_month = 0
+        self.axes: dict[str, list[str]] = {
+            "subgroup": list(name_aliases.keys()) + [NO_SUBGROUP],
+            "category": [],
+            "type": []
+        }
+        self.positions = {axis: {label: i for i, label in enumerate(labels)}
+                          for axis, labels in self.axes.items()}
+        self.data = {measure: np.zeros((0, len(self.axes["subgroup"]), 0, 0), dtype=np.int32)
+                     for measure in MEASURES}
+        self.totals = {measure: np.zeros((0, 1, 0, 0), dtype=np.int32) for measure in MEASURES}
+        # code -> signature of every counted entry
+        self.seen: dict[str, str] = {}
+        self.authors: set[str] = set()
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<ActivityCube {len(self.seen)} entries, shape {self.shape}>"
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """ Shape of every measure """
+        return self.data["entries"].shape
+
+    def months(self) -> list[str]:
+        """ Labels of the month axis, like 2024-03 """
+        return [f"{(self.base_month + i) // 12}-{(self.base_month + i) % 12 + 1:02d}"
+                for i in range(self.shape[0])]
+
+    def _extend_months(self, first: int, last: int) -> None:
+        """ Grow the month axis to cover absolute months first..last """
+        if self.shape[0] == 0:
+            self.base_month = first
+        before = max(0, self.base_month - first)
+        after = max(0, last - self.base_month - self.shape[0] + 1)
+        if before + after > 0:
+            for cubes in [self.data, self.totals]:
+                for measure in MEASURES:
+                    cubes[measure] = np.pad(cubes[measure], [(before, after), (0, 0), (0, 0), (0, 0)])
+            self.base_month -= before
+
+    def _label(self, axis: str, label: str) -> int:
+        """ Return the position of a label, growing the axis if needed """
+        if label not in self.positions[axis]:
+            self.positions[axis][label] = len(self.axes[axis])
+            self.axes[axis].append(label)
+            pad = [(0, 0)] * 4
+            pad[["subgroup", "category", "type"].index(axis) + 1] = (0, 1)
+            for measure in MEASURES:
+                self.data[measure] = np.pad(self.data[measure], pad)
+                if axis != "subgroup":
+                    self.totals[measure] = np.pad(self.totals[measure], pad)
+        return self.positions[axis][label]
+
+    def add(self, index_dict: dict[str, dict]) -> int:
+        """ Add new entries of a normalised index, return the number of entries added, changed or removed;
+        changed or removed entries, or new ones older than the newest counted, start over from scratch since
+        new authors are attributed to their first paper """
+        signatures = {code: entry_signature(value) for code, value in index_dict.items() if "date" in value}
+        stale = [code for code, signature in self.seen.items() if signatures.get(code) != signature]
+        newest = max((index_dict[code]["date"] for code in self.seen if code not in stale), default="")
+        if len(stale) > 0 or any(index_dict[code]["date"] < newest for code in signatures if code not in self.seen):
+            self.clear()
+        # Oldest first, so that new authors are attributed to their first paper
+        new = sorted(
+            [(code, index_dict[code]) for code in signatures if code not in self.seen],
+            key=lambda x: x[1]["date"]
+        )
+        if len(new) == 0:
+            return len(stale)
+        months = [int(value["date"][:4]) * 12 + int(value["date"][5:7]) - 1 for _, value in new]
+        self._extend_months(months[0], months[-1])
+
+        # One row per (entry, subgroup), the totals get subgroup 0 once per entry
+        rows: list[tuple[int, int, int, int, int, int]] = []
+        total_rows: list[tuple[int, int, int, int, int, int]] = []
+        for (code, value), month in zip(new, months):
+            self.seen[code] = signatures[code]
+            category = self._label("category", value["category"])
+            entry_type = self._label("type", value["type"])
+            subgroups = [self._label("subgroup", x) for x in value.get("subgroup", [])] or \
+                [self.positions["subgroup"][NO_SUBGROUP]]
+            new_authors = [x for x in value.get("author", []) if x not in self.authors]
+            self.authors.update(new_authors)
+            total_rows.append((month - self.base_month, 0, category, entry_type,
+                               int(value.get("revision", 0) > 0), len(new_authors)))
+            for subgroup in subgroups:
+                rows.append((month - self.base_month, subgroup, category, entry_type,
+                             int(value.get("revision", 0) > 0), len(new_authors)))
+
+        for cubes, cube_rows in [(self.data, rows), (self.totals, total_rows)]:
+            table = np.array(cube_rows, dtype=np.int64)
+            where = tuple(table[:, i] for i in range(4))
+            np.add.at(cubes["entries"], where, 1)
+            np.add.at(cubes["revisions"], where, table[:, 4])
+            np.add.at(cubes["new_authors"], where, table[:, 5])
+        assert int(self.totals["entries"].sum()) == len(self.seen), (self.totals["entries"].sum(), len(self.seen))
+        return len(new) + len([code for code in stale if code not in signatures])
+
+    def select(self, measure: str = "entries", start: str | None = None, end: str | None = None,
+               **labels: str | list[str]) -> np.ndarray:
+        """ Slice a measure by month range (inclusive, like 2020-01) and axis labels; without a subgroup label
+        the subgroup axis holds the single total, otherwise entries of several subgroups are in each of them """
+        months = self.months()
+        first = 0 if start is None else next((i for i, x in enumerate(months) if x >= start), len(months))
+        last = len(months) if end is None else next((i for i, x in enumerate(months) if x > end), len(months))
+        cube = (self.data if "subgroup" in labels else self.totals)[measure][first:last]
+        for axis_index, axis in enumerate(["subgroup", "category", "type"]):
+            if axis not in labels:
+                continue
+            wanted = labels[axis] if isinstance(labels[axis], list) else [labels[axis]]
+            positions = [self.positions[axis][x] for x in wanted if x in self.positions[axis]]
+            cube = np.take(cube, positions, axis=axis_index + 1)
+        return cube
+
+    def series(self, measure: str = "entries", by: str = "year", **labels: str | list[str]) -> dict[str, int]:
+        """ Roll up a measure into a time series by month or year """
+        values = self.select(measure, **labels).sum(axis=(1, 2, 3))
+        months = self.months()
+        if by == "month":
+            return dict(zip(months, values.tolist()))
+        years = np.array([int(x[:4]) for x in months], dtype=np.int32)
+        if len(years) == 0:
+            return {}
+        totals = np.bincount(years - years[0], weights=values, minlength=1).astype(np.int64)
+        return {str(years[0] + i): int(x) for i, x in enumerate(totals) if years[0] + i in years}
+
+    def rollup(self, measure: str = "entries", axis: str = "subgroup", **labels: str | list[str]) -> dict[str, int]:
+        """ Roll up a measure onto a single label axis """
+        axis_index = ["subgroup", "category", "type"].index(axis) + 1
+        if axis == "subgroup" and "subgroup" not in labels:
+            labels = dict(labels, subgroup=self.axes["subgroup"])
+        values = self.select(measure, **labels).sum(axis=tuple(x for x in range(4) if x != axis_index))
+        wanted = labels.get(axis)
+        names = self.axes[axis] if wanted is None else \
+            [x for x in (wanted if isinstance(wanted, list) else [wanted]) if x in self.positions[axis]]
+        return {name: int(x) for name, x in zip(names, values.tolist()) if x > 0}
+
+    def save(self, file: str = cube_name) -> None:
+        """ Save to a npz file """
+        np.savez_compressed(file, meta=np.array(json.dumps({
+            "base_month": self.base_month, "axes": self.axes,
+            "seen": self.seen, "authors": sorted(self.authors)
+        })), **self.data, **{f"total_{measure}": x for measure, x in self.totals.items()})
+
+    @classmethod
+    def load(cls, file: str = cube_name) -> "ActivityCube":
+        """ Load from a npz file """
+        data = np.load(file)
+        cube = cls()
+        if "total_entries" not in data.files:
+            # Saved before the subgroup-free totals, rebuild
+            return cube
+        meta = json.loads(str(data["meta"]))
+        cube.base_month = meta["base_month"]
+        cube.axes = meta["axes"]
+        cube.positions = {axis: {label: i for i, label in enumerate(labels)}
+                          for axis, labels in cube.axes.items()}
+        cube.data = {measure: data[measure] for measure in MEASURES}
+        cube.totals = {measure: data[f"total_{measure}"] for measure in MEASURES}
+        if isinstance(meta["seen"], list):
+            # Saved before the entry signatures, rebuild
+            return cls()
+        cube.seen = meta["seen"]
+        cube.authors = set(meta["authors"])
+        return cube
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild from scratch")
+    parser.add_argument("--measure", choices=MEASURES, default="entries", help="Measure to report")
+    parser.add_argument("--subgroup", nargs="*", help="Only these subgroups")
+    parser.add_argument("--by", choices=["year", "month"], default="year", help="Time bucket")
+    args = parser.parse_args()
+
+    cube = ActivityCube() if args.rebuild or not os.path.exists(cube_name) else ActivityCube.load()
+    with open("index.json", "r") as fp:
+        added = cube.add(json.load(fp))
+    if added > 0:
+        cube.save()
+        print(f"Update {added} entries, write {cube} to {cube_name}.")
+
+    labels = {} if args.subgroup is None else {"subgroup": args.subgroup}
+    print(f"{args.measure} per {args.by}:")
+    for bucket, count in cube.series(args.measure, args.by, **labels).items():
+        print(f"{bucket} -> {count}")
+    print(f"{args.measure} per subgroup:")
+    for subgroup, count in sorted(cube.rollup(args.measure, "subgroup", **labels).items(),
+                                  key=lambda x: x[1], reverse=True):
+        print(f"{subgroup} -> {count}")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -5,117 +5,249 @@
 
 # Library
 from glob import glob
+from time import perf_counter
+import argparse
 import json
-from pypdf import PdfReader
-from get_index import regularize_date
+import tracemalloc
+from typing import TYPE_CHECKING
+from date_formats import normalize_date, print_anomalies
+from instrument import metrics
+if TYPE_CHECKING:
+    from pypdf import PdfReader, PageObject
+
+
+# Attributes a page inherits from its ancestors in the page tree
+INHERITABLE = ["/Resources", "/MediaBox", "/CropBox", "/Rotate"]
+
+
+def page_index_map(reader: "PdfReader") -> tuple[dict[int, int], int, "PageObject | None"]:
+    """ Walk the page tree once, returning page reference -> index map, page count and first page """
+    from pypdf import PageObject
+    from pypdf.generic import DictionaryObject, IndirectObject, NameObject
+    page_map: dict[int, int] = {}
+    count = 0
+    first_page = None
+    pages = reader.root_object["/Pages"]
+    inherit = {attr: pages[attr] for attr in INHERITABLE if attr in pages}
+    kids = pages.get("/Kids", [])
+    # Stack of (kids iterator, inherited attributes, whether /Count says all kids are leaves)
+    stack = [(iter(kids), inherit, pages.get("/Count") == len(kids))]
+    while len(stack) > 0:
+        kids_iter, inherit, all_leaves = stack[-1]
+        kid = next(kids_iter, None)
+        if kid is None:
+            stack.pop()
+            continue
+        if all_leaves and first_page is not None and isinstance(kid, IndirectObject):
+            # No need to parse the page dictionary at all
+            page_map[kid.idnum] = count
+            count += 1
+            continue
+
+        node = kid.get_object()
+        if not isinstance(node, DictionaryObject) or len(node) == 0:
+            continue
+        if node.get("/Type") == "/Pages" or ("/Type" not in node and "/Kids" in node):
+            inherit = dict(inherit)
+            inherit.update({attr: node[attr] for attr in INHERITABLE if attr in node})
+            kids = node.get("/Kids", [])
+            stack.append((iter(kids), inherit, node.get("/Count") == len(kids)))
+            continue
+
+        # Only the first page is ever materialised
+        if first_page is None:
+            first_page = PageObject(reader, kid if isinstance(kid, IndirectObject) else None)
+            if not isinstance(kid, IndirectObject):
+                first_page.update(node)
+            for attr, value in inherit.items():
+                if attr not in first_page:
+                    first_page[NameObject(attr)] = value
+        if isinstance(kid, IndirectObject):
+            page_map[kid.idnum] = count
+        count += 1
+    return page_map, count, first_page
+
+
+def outline_pages(reader: "PdfReader", page_map: dict[int, int] | None = None) -> list[tuple[str, int]]:
+    """ Return (title, start page) of every top-level outline item """
+    result: list[tuple[str, int]] = []
+    for outline in (reader.outline if len(reader.outline) > 10 else reader.outline[-1]):
+        if isinstance(outline, list):
+            continue
+        assert outline.title is not None, outline
+        if page_map is None:
+            cur_page = reader.get_destination_page_number(outline)
+        else:
+            page = outline.page
+            idnum = page if isinstance(page, int) else getattr(page, "idnum", None)
+            cur_page = None if idnum is None else page_map.get(idnum)
+            if cur_page is None and idnum is not None:
+                # Unusual page tree (e.g. a /Pages node of a single page), resolve the slow way
+                cur_page = reader.get_destination_page_number(outline)
+        if cur_page is None:
+            cur_page = 0
+        result.append((outline.title, cur_page))
+    return result
+
+
+def section_title(title: str) -> str:
+    """ Strip clause number or Annex prefix from an outline title """
+    section_name = title.strip()
+    if section_name[0].isdigit():
+        section_name = section_name[section_name.find(" ") + 1:].strip()
+        assert not section_name[0].isdigit(), section_name
+    elif section_name[1] == " " and section_name[0] in "ABCDEF":
+        section_name = section_name[2:].strip()
+    elif section_name.startswith("Annex"):
+        if " - " in section_name:
+            section_name = section_name[section_name.find(" - ") + 3:].strip()
+        else:
+            section_name = section_name[6:].strip()
+            assert section_name[1] == " " and section_name[0] in "ABCDE", section_name
+            section_name = section_name[2:].strip()
+    return section_name
+
+
+def parse_date(front_text: str) -> str:
+    """ Find the date on the front page of a draft """
+    front_text = "".join(front_text.strip().split()).lower()
+    if "date:" in front_text:
+        front_text = front_text[front_text.find("date:") + 5:]
+    else:
+        front_text = front_text[front_text.find("edition") + 7:]
+    index = 0
+    while front_text[index].isdigit() or front_text[index] == "-":
+        index += 1
+    if index > 0:
+        # Like 2023-05-10
+        date = normalize_date(front_text[:index])
+    else:
+        # Like may15,2023 followed by revises or reply to
+        while not (front_text[index:].startswith("revise") or
+                   front_text[index:].startswith("reply")):
+            index += 1
+        date_str = front_text[:index]
+        index = 0
+        while not date_str[index].isdigit():
+            index += 1
+        index2 = date_str.find(",", index)
+        date = normalize_date(" ".join([date_str[index:index2], date_str[:index], date_str[index2 + 1:]]))
+    assert date is not None, front_text[:index]
+    return str(date)
+
+
+def analyze_draft(file: str, fast: bool = False) -> dict:
+    """ Analyze a single draft; fast mode only reads the page tree, outline and first page """
+    from pypdf import PdfReader
+    reader = PdfReader(file)
+    draft_name = file[file.find("/") + 1:file.rfind(".")].strip()
+    if fast:
+        page_map, pages, first_page = page_index_map(reader)
+        assert first_page is not None, file
+    else:
+        page_map = None
+        pages = reader.get_num_pages()
+        first_page = reader.pages[0]
+
+    # Basic properties
+    prop = {
+        "name": draft_name,
+        "pages": pages
+    }
+
+    # Fetch date
+    prop["date"] = parse_date(first_page.extract_text())
+
+    if len(reader.outline) == 0:
+        return prop
+
+    # Fetch page count of core, library and annex
+    # Core/Library separation is the "Library introduction" clause
+    # Library/Annex separation is "A Grammar summary"
+    start_page = -1
+    lib_page = -1
+    annex_page = -1
+    end_page = -1
+    section_dict = {}
+    last_start = -1
+    last_section = ""
+    for title, cur_page in outline_pages(reader, page_map):
+        if title[0].isdigit() and start_page == -1:
+            start_page = cur_page
+        if "library intro" in title.lower() and lib_page == -1:
+            lib_page = cur_page
+        if start_page != -1 and not title[0].isdigit() and annex_page == -1:
+            annex_page = cur_page
+        if "bibliography" in title.lower() and end_page == -1:
+            end_page = cur_page
+        if title.lower().startswith("cross") and end_page == -1:
+            end_page = cur_page
+        if title.lower().startswith("index") and end_page == -1:
+            end_page = cur_page
+
+        section_name = section_title(title)
+        if last_start >= 0:
+            section_dict[last_section] = cur_page - last_start
+        last_start = cur_page
+        last_section = section_name
+    if end_page == -1:
+        end_page = pages
+    assert 0 < start_page < lib_page < annex_page < end_page <= pages,\
+        [start_page, lib_page, annex_page, end_page]
+    prop["core"] = lib_page - start_page
+    prop["library"] = annex_page - lib_page
+    prop["annex"] = end_page - annex_page
+    section_dict[last_section] = pages - last_start
+    prop["sections"] = section_dict
+    return prop
 
 
 def main() -> None:
     """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fast", action="store_true",
+                        help="Metadata-only mode: read just the page tree, outline and first page")
+    parser.add_argument("--measure", action="store_true", help="Report time and peak memory per draft")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare against the existing wd_index.json instead of writing it")
+    args = parser.parse_args()
+
     wd_dict = {}
     file_list = glob("working-drafts/*.pdf")
     for i, file in enumerate(sorted(file_list)):
         print(f"[{i + 1:>{len(str(len(file_list)))}}/{len(file_list)}] Parsing {file}...",
               end="", flush=True)
-        reader = PdfReader(file)
-        draft_name = file[file.find("/") + 1:file.rfind(".")].strip()
-        pages = reader.get_num_pages()
-
-        # Basic properties
-        prop = {
-            "name": draft_name,
-            "pages": pages
-        }
+        if args.measure:
+            tracemalloc.start()
+        start_time = perf_counter()
+        with metrics().item("draft", file) as item:
+            prop = analyze_draft(file, args.fast)
+            item["pages"] = prop["pages"]
+        elapsed = perf_counter() - start_time
+        measure = ""
+        if args.measure:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measure = f" ({elapsed:.2f}s, peak {peak / 2 ** 20:.1f} MiB"
+            if item["peak_rss_mb"] is not None:
+                measure += f", peak RSS {item['peak_rss_mb']:.1f} MiB"
+            measure += ")"
 
-        # Fetch date
-        front_text = "".join(reader.pages[0].extract_text().strip().split()).lower()
-        if "date:" in front_text:
-            front_text = front_text[front_text.find("date:") + 5:]
+        wd_dict[prop["name"]] = prop
+        if "sections" in prop:
+            print(f" Done! Date = {prop['date']}{measure}", flush=True)
         else:
-            front_text = front_text[front_text.find("edition") + 7:]
-        index = 0
-        while front_text[index].isdigit() or front_text[index] == "-":
-            index += 1
-        try:
-            date = regularize_date(front_text[:index])
-        except IndexError:
-            while not (front_text[index:].startswith("revise") or
-                       front_text[index:].startswith("reply")):
-                index += 1
-            date_str = front_text[:index]
-            index = 0
-            while not date_str[index].isdigit():
-                index += 1
-            index2 = date_str.find(",", index)
-            date = regularize_date(" ".join([date_str[index:index2],
-                                             date_str[:index].capitalize(), date_str[index2 + 1:]]))
-        assert date is not None, front_text[:index]
-        prop["date"] = str(date)
-
-        if len(reader.outline) == 0:
-            wd_dict[draft_name] = prop
-            print(f" No Outline. Date = {prop['date']}", flush=True)
-            continue
+            print(f" No Outline. Date = {prop['date']}{measure}", flush=True)
 
-        # Fetch page count of core, library and annex
-        # Core/Library separation is the "Library introduction" clause
-        # Library/Annex separation is "A Grammar summary"
-        start_page = -1
-        lib_page = -1
-        annex_page = -1
-        end_page = -1
-        section_dict = {}
-        last_start = -1
-        last_section = ""
-        for outline in (reader.outline if len(reader.outline) > 10 else reader.outline[-1]):
-            if isinstance(outline, list):
-                continue
-            assert outline.title is not None, outline
-            cur_page = reader.get_destination_page_number(outline)
-            if cur_page is None:
-                cur_page = 0
-            if outline.title[0].isdigit() and start_page == -1:
-                start_page = cur_page
-            if "library intro" in outline.title.lower() and lib_page == -1:
-                lib_page = cur_page
-            if start_page != -1 and not outline.title[0].isdigit() and annex_page == -1:
-                annex_page = cur_page
-            if "bibliography" in outline.title.lower() and end_page == -1:
-                end_page = cur_page
-            if outline.title.lower().startswith("cross") and end_page == -1:
-                end_page = cur_page
-            if outline.title.lower().startswith("index") and end_page == -1:
-                end_page = cur_page
-
-            section_name = outline.title.strip()
-            if section_name[0].isdigit():
-                section_name = section_name[section_name.find(" ") + 1:].strip()
-                assert not section_name[0].isdigit(), section_name
-            elif section_name[1] == " " and section_name[0] in "ABCDEF":
-                section_name = section_name[2:].strip()
-            elif section_name.startswith("Annex"):
-                if " - " in section_name:
-                    section_name = section_name[section_name.find(" - ") + 3:].strip()
-                else:
-                    section_name = section_name[6:].strip()
-                    assert section_name[1] == " " and section_name[0] in "ABCDE", section_name
-                    section_name = section_name[2:].strip()
-            if last_start >= 0:
-                section_dict[last_section] = cur_page - last_start
-            last_start = cur_page
-            last_section = section_name
-        if end_page == -1:
-            end_page = pages
-        assert 0 < start_page < lib_page < annex_page < end_page <= pages,\
-            [start_page, lib_page, annex_page, end_page]
-        prop["core"] = lib_page - start_page
-        prop["library"] = annex_page - lib_page
-        prop["annex"] = end_page - annex_page
-        section_dict[last_section] = pages - last_start
-        prop["sections"] = section_dict
-
-        wd_dict[draft_name] = prop
-        print(f" Done! Date = {prop['date']}", flush=True)
+    print_anomalies("the working drafts")
+    if args.check:
+        with open("wd_index.json", "r") as fp:
+            orig_dict = json.load(fp)
+        diff = [code for code, prop in wd_dict.items() if orig_dict.get(code) != prop]
+        print(f"{len(wd_dict) - len(diff)} of {len(wd_dict)} entries identical to wd_index.json.")
+        if len(diff) > 0:
+            print("Different: " + ", ".join(diff))
+        return
 
     # Write to file
     with open("wd_index.json", "w") as fp:
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Resolve author name spellings of both indexes into canonical author IDs; updates give the grouping of a
+--rebuild, which is the reference result, while keeping the IDs already handed out """
+
+# Libraries
+import os
+import re
+import json
+import difflib
+import argparse
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+
+table_name = "authors.json"
+PARTICLES = {"van", "von", "de", "der", "den", "del", "della", "di", "da", "le", "la", "du", "st"}
+SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "phd"}
+SOUNDEX = {c: str(d) for d, letters in enumerate(["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+           for c in letters}
+
+
+def repair(name: str) -> str:
+    """ Repair UTF-8 text that was decoded as Latin-1, like MÃºgica """
+    try:
+        return name.encode("latin-1").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return name
+
+
+def split_authors(value: dict) -> list[str]:
+    """ Return the raw author names of an index entry """
+    names: list[str] = []
+    for name in value.get("author", []) + value.get("submitter", []):
+        names += [x.strip() for x in re.split(r"\s+and\s+", name) if x.strip() != ""]
+    return names
+
+
+@lru_cache(maxsize=None)
+def parse_name(name: str) -> tuple[tuple[str, ...], str]:
+    """ Return (given name tokens, surname) in lowercase ASCII; initials are 1-letter tokens """
+    name = re.sub(r"\(.*?\)", " ", repair(name))
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    tokens = [x for x in re.findall(r"[a-z0-9]+", name) if x not in SUFFIXES]
+    if len(tokens) == 0:
+        return (), ""
+    if any(c.isdigit() for x in tokens for c in x):
+        # Committees and documents, like WG14/WG21 or Cor. 1:1994, are kept whole as a surname-only name
+        return (), " ".join(tokens)
+    start = len(tokens) - 1
+    while start > 0 and tokens[start - 1] in PARTICLES:
+        start -= 1
+    return tuple(tokens[:start]), " ".join(tokens[start:])
+
+
+def soundex(surname: str) -> str:
+    """ Return the Soundex code of a surname """
+    letters = surname.replace(" ", "")
+    if letters == "":
+        return ""
+    result = letters[0]
+    last = SOUNDEX.get(letters[0], "")
+    for c in letters[1:]:
+        code = SOUNDEX.get(c, "")
+        if code != last and code not in ["", "0"]:
+            result += code
+        if c not in "hw":
+            last = code
+    return (result + "000")[:4]
+
+
+class AuthorTable:
+    """ Represents the name -> canonical author ID table """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        self.ids: dict[str, str] = {}
+        self.counts: Counter = Counter()
+        self.members: dict[str, set[str]] = defaultdict(set)
+        self.blocks: dict[str, set[str]] = defaultdict(set)
+        self.next_id = 1
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<AuthorTable {len(self.ids)} names, {len(self.members)} authors>"
+
+    def _union(self, id1: str, id2: str) -> str:
+        """ Merge two author IDs, keeping the older one """
+        if id1 == id2:
+            return id1
+        keep, drop = sorted([id1, id2])
+        for name in self.members.pop(drop):
+            self.ids[name] = keep
+            self.members[keep].add(name)
+        return keep
+
+    def _candidates(self, block: str, given: tuple[str, ...], want_full: bool) -> set[str]:
+        """ IDs in a block that have a full (or only initial) given name matching given """
+        result: set[str] = set()
+        for other in self.blocks[block]:
+            other_given, _ = parse_name(other)
+            if len(other_given) == 0:
+                continue
+            if want_full and len(other_given[0]) == 1:
+                continue
+            if len(given) == 0 or given[0][0] == other_given[0][0] and (
+                len(given[0]) == 1 or len(other_given[0]) == 1 or given[0] == other_given[0]
+            ):
+                result.add(self.ids[other])
+        return result
+
+    def _resolve(self, name: str) -> None:
+        """ Assign an ID to a single new name by comparing it with its blocks only """
+        given, surname = parse_name(name)
+        exact = f"s:{surname}"
+        phonetic = f"p:{soundex(surname)}"
+        self.ids[name] = f"A{self.next_id:05d}"
+        self.members[self.ids[name]].add(name)
+        self.next_id += 1
+        self.blocks[exact].add(name)
+        self.blocks[phonetic].add(name)
+
+        if surname != "":
+            if len(given) > 0 and len(given[0]) > 1:
+                # Full given name: same surname, or surname typo with identical given name
+                for other in self.blocks[exact] | self.blocks[phonetic]:
+                    other_given, other_surname = parse_name(other)
+                    if len(other_given) == 0 or len(other_given[0]) == 1:
+                        continue
+                    if other_given[0] == given[0] and (other_surname == surname or difflib.SequenceMatcher(
+                            None, other_surname, surname).ratio() >= 0.85):
+                        self._union(self.ids[name], self.ids[other])
+
+                # Short forms seen before without a full name may now be unambiguous
+                for other in list(self.blocks[exact]):
+                    other_given = parse_name(other)[0]
+                    if any(len(parse_name(x)[0]) > 0 and len(parse_name(x)[0][0]) > 1
+                           for x in self.members[self.ids[other]]):
+                        continue
+                    if self._candidates(exact, other_given, True) == {self.ids[name]}:
+                        self._union(self.ids[name], self.ids[other])
+            else:
+                # Initials or surname only: join only an unambiguous full-name author
+                full = self._candidates(exact, given, True)
+                if len(full) == 0 and len(given) == 0:
+                    full = {
+                        self.ids[other] for other in self.blocks[phonetic]
+                        if len(parse_name(other)[0]) > 0 and difflib.SequenceMatcher(
+                            None, parse_name(other)[1], surname).ratio() >= 0.85
+                    }
+                if len(full) == 1:
+                    self._union(self.ids[name], full.pop())
+                elif len(full) == 0:
+                    # Otherwise merge with identical short forms, like "Thomas" and "THOMAS"
+                    for other in self.blocks[exact]:
+                        if parse_name(other)[0][:1] == given[:1]:
+                            self._union(self.ids[name], self.ids[other])
+
+    def _affected(self, new: list[str]) -> set[str]:
+        """ Return the new names and every known name sharing a surname or Soundex block with them, transitively;
+        no other name can take part in resolving them """
+        pending: dict[str, set[str]] = defaultdict(set)
+        for name in new:
+            _, surname = parse_name(name)
+            pending[f"s:{surname}"].add(name)
+            pending[f"p:{soundex(surname)}"].add(name)
+        result = set(new)
+        todo = list(new)
+        visited: set[str] = set()
+        while len(todo) > 0:
+            _, surname = parse_name(todo.pop())
+            for block in [f"s:{surname}", f"p:{soundex(surname)}"]:
+                if block in visited:
+                    continue
+                visited.add(block)
+                for other in self.blocks.get(block, set()) | pending.get(block, set()):
+                    if other not in result:
+                        result.add(other)
+                        todo.append(other)
+        return result
+
+    def add(self, names: Counter) -> int:
+        """ Add name occurrences; the blocks of new names are resolved again from scratch, so the result is the
+        one of a full rebuild, and resolved authors keep their oldest ID """
+        new = [name for name in names if name not in self.ids]
+        self.counts.update(names)
+        if len(new) == 0:
+            return 0
+        affected = self._affected(new)
+        old_ids = {name: self.ids.pop(name) for name in affected if name in self.ids}
+        for name in affected:
+            _, surname = parse_name(name)
+            self.blocks[f"s:{surname}"].discard(name)
+            self.blocks[f"p:{soundex(surname)}"].discard(name)
+        for author_id in set(old_ids.values()):
+            self.members[author_id] -= affected
+            if len(self.members[author_id]) == 0:
+                del self.members[author_id]
+
+        # Full names first, then initials, then surname only, so short forms see every full name
+        def stage(name: str) -> int:
+            given, _ = parse_name(name)
+            return 2 if len(given) == 0 else 1 if len(given[0]) == 1 else 0
+        first_id = self.next_id
+        for name in sorted(affected, key=lambda x: (stage(x), -self.counts[x], x)):
+            self._resolve(name)
+
+        # Give every resolved author the oldest free ID of its names, or the next new one
+        resolved = {author_id: self.members.pop(author_id) for author_id in
+                    sorted({self.ids[name] for name in affected})}
+        self.next_id = first_id
+        taken = set(self.members)
+        renamed: dict[str, set[str]] = {}
+        for members in sorted(resolved.values(), key=lambda x: min(old_ids.get(y, "~") for y in x)):
+            free = sorted({old_ids[x] for x in members if x in old_ids} - taken)
+            if len(free) > 0:
+                author_id = free[0]
+            else:
+                author_id = f"A{self.next_id:05d}"
+                self.next_id += 1
+            taken.add(author_id)
+            renamed[author_id] = members
+        for author_id, members in renamed.items():
+            self.members[author_id] = members
+            for name in members:
+                self.ids[name] = author_id
+        return len(new)
+
+    def refresh(self, names: Counter) -> int:
+        """ Recount all name occurrences, resolving only new names """
+        self.counts = Counter()
+        return self.add(names)
+
+    def canonical(self, author_id: str) -> str:
+        """ Return the canonical spelling of an author: the most common full name; on a tie the spelling closest
+        to the others, so a one-off typo loses, then the first alphabetically """
+        members = sorted(self.members[author_id])
+
+        def closeness(name: str) -> float:
+            return sum(difflib.SequenceMatcher(None, name, other).ratio() for other in members if other != name)
+        return max(members, key=lambda x: (len(parse_name(x)[0]) > 0 and len(parse_name(x)[0][0]) > 1,
+                                           self.counts[x], closeness(x)))
+
+    def author_id(self, name: str) -> str | None:
+        """ Return the author ID of a raw name """
+        return self.ids.get(name)
+
+    def save(self, file: str = table_name) -> None:
+        """ Save to a JSON file """
+        with open(file, "w") as fp:
+            json.dump({
+                "next_id": self.next_id,
+                "authors": {
+                    author_id: {"name": self.canonical(author_id),
+                                "aliases": sorted(self.members[author_id])}
+                    for author_id in sorted(self.members)
+                },
+                "names": {name: [self.ids[name], self.counts[name]] for name in sorted(self.ids)}
+            }, fp, indent=4, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, file: str = table_name) -> "AuthorTable":
+        """ Load from a JSON file """
+        with open(file, "r") as fp:
+            data = json.load(fp)
+        table = cls()
+        table.next_id = data["next_id"]
+        for name, (author_id, count) in data["names"].items():
+            table.ids[name] = author_id
+            table.counts[name] = count
+            table.members[author_id].add(name)
+            _, surname = parse_name(name)
+            table.blocks[f"s:{surname}"].add(name)
+            table.blocks[f"p:{soundex(surname)}"].add(name)
+        return table
+
+
+def collect_names(files: list[str]) -> Counter:
+    """ Count raw author names in the given index files """
+    names: Counter = Counter()
+    for file in files:
+        if os.path.exists(file):
+            with open(file, "r") as fp:
+                for value in json.load(fp).values():
+                    names.update(split_authors(value))
+    return names
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Resolve every name from scratch")
+    parser.add_argument("names", nargs="*", help="Names to look up")
+    args = parser.parse_args()
+
+    table = AuthorTable() if args.rebuild or not os.path.exists(table_name) else AuthorTable.load()
+    added = table.refresh(collect_names(["index.json", "index-wg14.json"]))
+    table.save()
+    print(f"Resolve {added} new names, write {table} to {table_name}.")
+
+    for name in args.names:
+        author_id = table.author_id(name)
+        if author_id is None:
+            print(f"{name}: unknown")
+        else:
+            print(f"{name}: {author_id} {table.canonical(author_id)} <- " +
+                  ", ".join(sorted(table.members[author_id])))
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Benchmark the hot paths on synthetic fixtures, results stored as JSON for comparison """
+
+# Libraries
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import subprocess
+from datetime import date, datetime, timedelta
+from statistics import median
+from time import perf_counter
+from typing import Any, Callable
+
+
+fixture_dir = "bench_fixtures/"
+result_dir = "bench_results/"
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+SUBGROUPS = [
+    "EWG", "LWG", "CWG", "LEWG", "SG1", "Evolution", "Library Evolution", "Core", "EWGI SG17: EWG Incubator",
+    "SG16, SG22", "LEWG/LWG", "EWG, SG7", "SG1 Concurrency and Parallelism", "SG23 Safety and Security",
+    "Networking and Ranges", "I/O", "C/C++ Liaison", "WG21", "SG15 Tooling", "DG"
+]
+WORDS = ["template", "constexpr", "ill-formed", "undefined behavior", "shall"]
+VOCABULARY = (
+    "the of a an expression type shall be template object function class member value if is ill-formed "
+    "program constexpr declaration reference pointer undefined behavior implementation defined operator "
+    "specialization argument parameter initialization conversion evaluation sequence library requirement"
+).split()
+
+
+def raw_date(rng: random.Random) -> str:
+    """ Return a WG21 raw date in one of the index formats """
+    day = date(1989, 1, 1) + timedelta(days=rng.randrange(13000))
+    kind = rng.random()
+    if kind < 0.93:
+        return day.isoformat()
+    if kind < 0.96:
+        return f"{day.day} {day.strftime('%B')}, {day.year}"
+    if kind < 0.99:
+        return f"{MONTHS[day.month - 1]} {day.year}"
+    return "unknown"
+
+
+def make_wg21_index(count: int, seed: int = 21) -> dict[str, dict]:
+    """ Return a raw wg21.link index.json of about count entries """
+    rng = random.Random(seed)
+    index: dict[str, dict] = {}
+    number = 0
+    while len(index) < count:
+        kind = rng.random()
+        number += 1
+        if kind < 0.7:
+            for revision in range(rng.randrange(1, 4)):
+                value = {"type": "paper", "title": f"Paper {number}", "date": raw_date(rng),
+                         "author": ", ".join(f"Author {rng.randrange(5000)}" for _ in range(rng.randrange(1, 4))),
+                         "long_link": f"https://www.open-std.org/jtc1/sc22/wg21/docs/papers/p{number}r{revision}.pdf"}
+                if rng.random() < 0.8:
+                    value["subgroup"] = rng.choice(SUBGROUPS)
+                index[f"P{number:04}R{revision}"] = value
+        elif kind < 0.9:
+            index[f"CWG{number}"] = {"type": "issue", "title": f"Issue {number}", "date": raw_date(rng),
+                                     "section": f"{rng.randrange(1, 30)}.{rng.randrange(1, 9)} [expr.post]",
+                                     "submitter": f"Author {rng.randrange(5000)}"}
+        else:
+            index[f"EDIT{number}"] = {"type": "editorial", "title": f"[basic.life] Fix wording {number}",
+                                      "date": raw_date(rng)}
+    return index
+
+
+def make_wg14_log(count: int, seed: int = 14) -> str:
+    """ Return a WG14 document log page of count entries in all its date formats """
+    rng = random.Random(seed)
+    lines = []
+    for number in range(1, count + 1):
+        day = date(1986, 1, 1) + timedelta(days=int(number * 13000 / count))
+        if day.year < 1995:
+            date_str = f"{day.day:02} {MONTHS[day.month - 1]} {day.year % 100:02}"
+        elif day.year < 2000:
+            date_str = f"{day.day:02}-{MONTHS[day.month - 1]}-{day.year % 100:02}"
+        elif day.year < 2005:
+            date_str = f"{day.day:02}-{MONTHS[day.month - 1]}-{day.year}"
+        else:
+            date_str = day.strftime("%Y/%m/%d")
+        authors = " & ".join(f"Author {rng.randrange(800)}" for _ in range(rng.randrange(1, 3)))
+        code = f"N{number}"
+        lines.append(f'<a href="docs/n{number}.pdf">{code}</a>\t{date_str} {authors}, Title of document {number}')
+    return "<html><body><pre>\n" + "\n".join(lines) + "\n</pre></body></html>"
+
+
+def make_support_html(features: int, vendors: int, seed: int = 26) -> str:
+    """ Return a cppreference-style compiler support table """
+    rng = random.Random(seed)
+    names = [f"Vendor{i}" for i in range(vendors)]
+    rows = ["<tr><th>Feature</th><th>Paper(s)</th>" + "".join(f"<th>{x}*</th>" for x in names) +
+            "<th>Other</th></tr>"]
+    for i in range(features):
+        cells = []
+        for _ in names:
+            kind = rng.random()
+            if kind < 0.3:
+                cells.append("<td></td>")
+            elif kind < 0.4:
+                cells.append("<td>partial</td>")
+            elif kind < 0.6:
+                cells.append(f"<td>{rng.randrange(5, 19)}<br>(partial)*</td>")
+            elif kind < 0.7:
+                cells.append("<td>Yes</td>")
+            else:
+                cells.append(f"<td>{rng.randrange(5, 19)} (partial)<br>{rng.randrange(19, 30)}.{rng.randrange(10)}</td>")
+        rows.append(f"<tr><td>Feature {i}</td><td>P{1000 + i}R{rng.randrange(4)}</td>" + "".join(cells) + "</tr>")
+    rows.append("<tr><td>Footer</td></tr>")
+    return '<html><body><div><h3>C++26 core language features</h3><table class="t-compiler-support-top">' + \
+        "\n".join(rows) + "</table></div></body></html>"
+
+
+def make_draft_pdf(file: str, pages: int, seed: int = 17) -> None:
+    """ Write a working draft with a front page, text on every page and a clause outline """
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    })
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+
+    def add_page(lines: list[str]) -> None:
+        """ Add a page with the given text lines """
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = resources
+        body = "".join(f"({x}) Tj 0 -14 Td " for x in lines)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 11 Tf 72 740 Td {body}ET".encode())
+        page.replace_contents(stream)
+
+    add_page(["Document Number: N9999", "Date: 2024-03-18", "Working Draft, Programming Languages C++"])
+    for _ in range(1, pages):
+        add_page([" ".join(rng.choice(VOCABULARY) for _ in range(12)) for _ in range(45)])
+
+    # Clauses take the middle 80%, split into core, library and a few annexes
+    clauses = 30
+    titles = [f"{i + 1} Clause number {i + 1}" for i in range(clauses)]
+    titles[clauses // 2] = f"{clauses // 2 + 1} Library introduction"
+    titles += [f"{x} Annex {x}" for x in "ABCDE"] + ["Bibliography", "Cross-references", "Index"]
+    writer.add_outline_item("Contents", 1)
+    for i, title in enumerate(titles):
+        writer.add_outline_item(title, 2 + i * (pages - 3) // len(titles))
+    with open(file, "wb") as fp:
+        writer.write(fp)
+
+
+def fixture(name: str, make: Callable[[str], None]) -> str:
+    """ Return the path of a fixture, generating it on first use """
+    path = os.path.join(fixture_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(fixture_dir, exist_ok=True)
+        print(f"Generating {path}...", flush=True)
+        make(path)
+    return path
+
+
+def write_text(path: str, text: str) -> None:
+    """ Write a text fixture """
+    with open(path, "w") as fp:
+        fp.write(text)
+
+
+def measure(func: Callable[[], Any], items: int, repeat: int) -> dict[str, float]:
+    """ Time func repeat times, each processing items items """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return {"items": items, "repeat": repeat, "best": min(times), "median": median(times),
+            "per_item_us": 1e6 * min(times) / max(items, 1)}
+
+
+def run(entries: int, pages: int, repeat: int, only: list[str]) -> dict[str, dict[str, float]]:
+    """ Run all benchmarks (or those whose name contains one of only) """
+    import get_index
+    import get_index_wg14
+
+    wg21_file = fixture(f"index-{entries}.json",
+                        lambda x: write_text(x, json.dumps(make_wg21_index(entries))))
+    wg14_file = fixture("wg14_document_log.html", lambda x: write_text(x, make_wg14_log(3500)))
+    support_file = fixture("compiler_support.html", lambda x: write_text(x, make_support_html(400, 12)))
+    draft_file = fixture(f"draft-{pages}.pdf", lambda x: make_draft_pdf(x, pages))
+
+    with open(wg21_file, "r") as fp:
+        wg21_index = json.load(fp)
+    dates = [x["date"] for x in wg21_index.values() if "date" in x]
+    subgroups = [x["subgroup"] for x in wg21_index.values() if "subgroup" in x]
+    with open(wg14_file, "r") as fp:
+        wg14_log = fp.read()
+    with open(support_file, "r") as fp:
+        support_html = fp.read()
+
+    def analyze_table() -> Callable[[], Any]:
+        """ Analyze the parsed support fixture """
+        from bs4 import BeautifulSoup
+        from compiler_support import analyze_table
+        table = BeautifulSoup(support_html, "lxml").find("table")
+        return lambda: analyze_table("C++26", table)
+
+    def support_score() -> Callable[[], Any]:
+        """ Score every vendor of the support fixture """
+        table = analyze_table()()
+        return lambda: [table.support_score(vendor, "20") for vendor in table.vendors]
+
+    def analyze(fast: bool) -> Callable[[], Any]:
+        """ Analyze the draft fixture """
+        from analyze_wd import analyze_draft
+        return lambda: analyze_draft(draft_file, fast)
+
+    def count() -> None:
+        """ Count words in the draft fixture """
+        from pypdf import PdfReader
+        from find_words import count_words
+        count_words(PdfReader(draft_file), WORDS)
+
+    def regularize_dates() -> None:
+        """ Parse all dates with a fresh parser, so memoisation only helps within a run """
+        from date_formats import DateParser
+        parse = DateParser()
+        for x in dates:
+            parse(x)
+
+    benchmarks: dict[str, tuple[Callable[[], Callable[[], Any]], int, int]] = {
+        # name -> (setup returning the timed callable, items, repeat)
+        "wg21.regularize_date": (lambda: regularize_dates, len(dates), repeat),
+        "wg21.process_subgroup": (lambda: lambda: [get_index.process_subgroup(x) for x in subgroups],
+                                  len(subgroups), repeat),
+        "wg14.parse_log": (lambda: lambda: get_index_wg14.parse_log(wg14_log), 3500, 1),
+        "analyze_wd.analyze_draft": (lambda: analyze(False), 1, repeat),
+        "analyze_wd.analyze_draft_fast": (lambda: analyze(True), 1, repeat),
+        "find_words.count_words": (lambda: count, pages, 1),
+        "compiler_support.analyze_table": (analyze_table, 400, repeat),
+        "compiler_support.support_score": (support_score, 400 * 12, repeat),
+    }
+
+    results = {}
+    for name, (setup, items, times) in benchmarks.items():
+        if len(only) > 0 and not any(x in name for x in only):
+            continue
+        result = measure(setup(), items, times)
+        results[name] = result
+        print(f"{name:<34} best {result['best'] * 1000:>10.2f} ms  median {result['median'] * 1000:>10.2f} ms"
+              f"  {result['per_item_us']:>10.2f} us/item", flush=True)
+    return results
+
+
+def git_commit() -> str | None:
+    """ Return the current commit, if any """
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def compare(old_file: str, results: dict[str, dict[str, float]]) -> None:
+    """ Print the speed ratio of every benchmark against an older run """
+    with open(old_file, "r") as fp:
+        old = json.load(fp)["results"]
+    print(f"\nCompared to {old_file}:")
+    for name, result in results.items():
+        if name in old and old[name]["items"] == result["items"]:
+            ratio = old[name]["best"] / result["best"]
+            print(f"{name:<34} {ratio:>6.2f}x " + ("faster" if ratio >= 1 else "slower"))
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("only", nargs="*", help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--entries", type=int, default=100000, help="Entries of the synthetic WG21 index")
+    parser.add_argument("--pages", type=int, default=2000, help="Pages of the synthetic draft")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of each benchmark")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.entries, args.pages, args.repeat, args.only)
+    os.makedirs(result_dir, exist_ok=True)
+    result_file = os.path.join(result_dir, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(result_file, "w") as fp:
+        json.dump({
+            "date": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+            "python": sys.version.split()[0], "platform": platform.platform(),
+            "parameters": {"entries": args.entries, "pages": args.pages, "repeat": args.repeat},
+            "results": results
+        }, fp, indent=4)
+        print(f"Write {len(results)} results to {result_file}.")
+    if args.compare is not None:
+        compare(args.compare, results)
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Content-addressed document store: files in docs/ and working-drafts/ are hard links to hash-named blobs """
+
+# Libraries
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from typing import Any
+
+
+blob_dir = "blobs/"
+manifest_name = os.path.join(blob_dir, "manifest.json")
+STORED_DIRS = ["docs/", "working-drafts/"]
+
+
+def content_hash(content: bytes) -> str:
+    """ Return the SHA-256 of some content """
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_hash(file: str) -> str:
+    """ Return the SHA-256 of a file, read in chunks """
+    digest = hashlib.sha256()
+    with open(file, "rb") as fp:
+        for chunk in iter(lambda: fp.read(2 ** 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(digest: str, directory: str = blob_dir) -> str:
+    """ Return the path of a blob """
+    return os.path.join(directory, digest[:2], digest)
+
+
+def write_blob(content: bytes, directory: str = blob_dir) -> tuple[str, bool]:
+    """ Store content under its hash unless already there, return (hash, whether written) """
+    digest = content_hash(content)
+    path = blob_path(digest, directory)
+    if os.path.exists(path):
+        return digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as fp:
+        fp.write(content)
+    os.replace(path + ".tmp", path)
+    return digest, True
+
+
+def stat_signature(file: str) -> list[int]:
+    """ Return the (size, mtime) signature of a file """
+    stat = os.stat(file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BlobStore:
+    """ Represents the blob directory and the manifest of which path holds which blob """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        # path -> {"sha256": hash, "signature": [size, mtime]}
+        self.manifest: dict[str, dict[str, Any]] = {}
+        self.dirty = False
+        if os.path.exists(manifest_name):
+            with open(manifest_name, "r") as fp:
+                self.manifest = json.load(fp)
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<BlobStore {len(self.manifest)} paths, {len(self.blobs())} blobs>"
+
+    def blobs(self) -> set[str]:
+        """ Return the hashes of all referenced blobs """
+        return {entry["sha256"] for entry in self.manifest.values()}
+
+    def lookup(self, path: str) -> str | None:
+        """ Return the hash of a stored path, if it is unchanged since it was stored """
+        entry = self.manifest.get(os.path.normpath(path))
+        if entry is None or not os.path.exists(path) or stat_signature(path) != entry["signature"]:
+            return None
+        return entry["sha256"]
+
+    def _link(self, digest: str, path: str) -> None:
+        """ Make path a hard link to a blob (a copy where links are unsupported) """
+        source = blob_path(digest)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp = path + ".tmp"
+        if os.path.lexists(temp):
+            os.remove(temp)
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copy2(source, temp)
+        os.replace(temp, path)
+        self.manifest[os.path.normpath(path)] = {"sha256": digest, "signature": stat_signature(path)}
+        self.dirty = True
+
+    def put(self, path: str, content: bytes) -> tuple[str, bool]:
+        """ Store content at path, return (hash, whether path changed); unchanged content is not written """
+        digest = content_hash(content)
+        if self.lookup(path) == digest:
+            return digest, False
+        _, written = write_blob(content)
+        if written:
+            # Links share the blob, so nobody may rewrite it in place
+            os.chmod(blob_path(digest), 0o444)
+        self._link(digest, path)
+        return digest, True
+
+    def copy(self, source: str, path: str) -> str | None:
+        """ Store an already stored file under another path without reading it, return its hash """
+        digest = self.lookup(source)
+        if digest is None:
+            return None
+        if self.lookup(path) != digest:
+            self._link(digest, path)
+        return digest
+
+    def adopt(self, path: str) -> tuple[str, bool]:
+        """ Move an existing file into the store, return (hash, whether its content was already stored) """
+        digest = self.lookup(path)
+        if digest is not None:
+            return digest, True
+        digest = file_hash(path)
+        known = os.path.exists(blob_path(digest))
+        if not known:
+            os.makedirs(os.path.dirname(blob_path(digest)), exist_ok=True)
+            shutil.copy2(path, blob_path(digest) + ".tmp")
+            os.replace(blob_path(digest) + ".tmp", blob_path(digest))
+            os.chmod(blob_path(digest), 0o444)
+        self._link(digest, path)
+        return digest, known
+
+    def forget_missing(self) -> int:
+        """ Drop manifest entries of deleted paths, return how many """
+        missing = [path for path in self.manifest if not os.path.exists(path)]
+        for path in missing:
+            del self.manifest[path]
+        self.dirty = self.dirty or len(missing) > 0
+        return len(missing)
+
+    def collect_garbage(self) -> int:
+        """ Remove blobs no path refers to, return how many """
+        referenced = self.blobs()
+        removed = 0
+        if not os.path.isdir(blob_dir):
+            return 0
+        for prefix in os.listdir(blob_dir):
+            directory = os.path.join(blob_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+        return removed
+
+    def save(self) -> None:
+        """ Save the manifest if changed """
+        if not self.dirty:
+            return
+        os.makedirs(blob_dir, exist_ok=True)
+        with open(manifest_name + ".tmp", "w") as fp:
+            json.dump(self.manifest, fp, indent=1, sort_keys=True)
+        os.replace(manifest_name + ".tmp", manifest_name)
+        self.dirty = False
+
+
+_manifest: dict[str, dict[str, Any]] | None = None
+
+
+def stored_hash(file: str) -> str | None:
+    """ Return the content hash of a file from the manifest (loaded once), if it is unchanged """
+    global _manifest
+    if _manifest is None:
+        _manifest = BlobStore().manifest
+    entry = _manifest.get(os.path.normpath(file))
+    if entry is None or stat_signature(file) != entry["signature"]:
+        return None
+    return entry["sha256"]
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adopt", action="store_true", help="Move existing files of docs/ and working-drafts/ in")
+    parser.add_argument("--gc", action="store_true", help="Forget deleted paths and remove unreferenced blobs")
+    args = parser.parse_args()
+
+    store = BlobStore()
+    if args.adopt:
+        files = [os.path.join(directory, name) for directory in STORED_DIRS if os.path.isdir(directory)
+                 for name in sorted(os.listdir(directory)) if not name.endswith(".tmp")]
+        duplicates = 0
+        saved = 0
+        for i, file in enumerate(files):
+            was_stored = store.lookup(file) is not None
+            _, known = store.adopt(file)
+            if known and not was_stored:
+                duplicates += 1
+                saved += os.path.getsize(file)
+            if i % 500 == 499:
+                store.save()
+                print(f"  {i + 1}/{len(files)}", flush=True)
+        store.save()
+        print(f"Adopted {len(files)} files, {duplicates} duplicates ({saved / 2 ** 20:.1f} MiB saved).")
+    if args.gc:
+        forgotten = store.forget_missing()
+        store.save()
+        print(f"Forgot {forgotten} deleted paths, removed {store.collect_garbage()} unreferenced blobs.")
+
+    paths = len(store.manifest)
+    blobs = store.blobs()
+    size = sum(os.path.getsize(blob_path(x)) for x in blobs if os.path.exists(blob_path(x)))
+    print(f"{store}: {size / 2 ** 20:.1f} MiB of blobs for {paths} paths.")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Extract the citation graph between papers """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+import numpy as np
+from paper_text import file_signature, list_papers, paper_code, read_paper
+
+
+cache_name = "citation_cache.json"
+graph_name = "citation_graph.npz"
+
+
+def paper_base(code: str, value: dict) -> tuple[str, int]:
+    """ Return the (category, number) key of an index entry, dropping revision """
+    return value["category"].upper(), value["number"]
+
+
+@lru_cache(maxsize=None)
+def build_matcher(categories: tuple[str, ...]) -> re.Pattern:
+    """ Build one compiled matcher over all the known code categories """
+    # Longest first so that LEWG is tried before EWG
+    alternatives = "|".join(re.escape(x) for x in sorted(categories, key=len, reverse=True))
+    return re.compile(fr"\b({alternatives})[ -]?(\d+)(?:R\d+)?\b", re.IGNORECASE)
+
+
+def extract_refs(categories: tuple[str, ...], file: str) -> tuple[str, list[tuple[str, int]]]:
+    """ Extract all the (category, number) references inside a single file """
+    pattern = build_matcher(categories)
+    refs: set[tuple[str, int]] = set()
+    for match in pattern.finditer(read_paper(file, strip_html=False)):
+        category, number = match.group(1), match.group(2)
+        # Single-letter codes with 1 or 2 digits are mostly noise in either case (n1, P2, C11)
+        if len(category) == 1 and len(number) < 3:
+            continue
+        refs.add((category.upper(), int(number)))
+    return file, sorted(refs)
+
+
+class CitationGraph:
+    """ Represents a citation graph stored as CSR adjacency arrays """
+
+    def __init__(self, nodes: list[str], years: np.ndarray,
+                 indptr: np.ndarray, indices: np.ndarray) -> None:
+        """ Constructor """
+        self.nodes = nodes
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.years = years
+        self.indptr = indptr
+        self.indices = indices
+
+        # Reverse (cited-by) adjacency
+        sources = np.repeat(np.arange(len(nodes), dtype=np.int32), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        self.rev_indices = sources[order]
+        self.rev_indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(nodes)), out=self.rev_indptr[1:])
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<CitationGraph {len(self.nodes)} papers, {len(self.indices)} citations>"
+
+    def _index(self, code: str) -> int:
+        """ Return the node index of a code, with or without revision """
+        code = code.strip().upper()
+        if code not in self.node_index and "R" in code[1:]:
+            code = code[:code.rfind("R")]
+        if code not in self.node_index:
+            raise KeyError(f"Unknown paper {code}")
+        return self.node_index[code]
+
+    def cites(self, code: str) -> list[str]:
+        """ Return all the papers cited by code """
+        i = self._index(code)
+        return [self.nodes[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def cited_by(self, code: str) -> list[str]:
+        """ Return all the papers citing code """
+        i = self._index(code)
+        return [self.nodes[j] for j in self.rev_indices[self.rev_indptr[i]:self.rev_indptr[i + 1]]]
+
+    def dependencies(self, code: str) -> list[str]:
+        """ Return all the papers transitively cited by code, in BFS order """
+        start = self._index(code)
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        visited[start] = True
+        queue = deque([start])
+        result: list[str] = []
+        while queue:
+            i = queue.popleft()
+            for j in self.indices[self.indptr[i]:self.indptr[i + 1]]:
+                if not visited[j]:
+                    visited[j] = True
+                    result.append(self.nodes[j])
+                    queue.append(j)
+        return result
+
+    def most_cited(self, year: int | None = None, top: int = 10) -> list[tuple[str, int]]:
+        """ Return the most cited papers, counting only citing papers of a given year """
+        if year is None:
+            counts = np.diff(self.rev_indptr)
+        else:
+            sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+            counts = np.bincount(self.indices[self.years[sources] == year],
+                                 minlength=len(self.nodes))
+        order = np.argsort(-counts, kind="stable")[:top]
+        return [(self.nodes[i], int(counts[i])) for i in order if counts[i] > 0]
+
+    def save(self, file: str = graph_name) -> None:
+        """ Save to a npz file """
+        np.savez_compressed(file, nodes=np.array(self.nodes), years=self.years,
+                            indptr=self.indptr, indices=self.indices)
+
+    @classmethod
+    def load(cls, file: str = graph_name) -> "CitationGraph":
+        """ Load from a npz file """
+        data = np.load(file)
+        return cls(data["nodes"].tolist(), data["years"], data["indptr"], data["indices"])
+
+
+def build_graph(index_dict: dict[str, dict], file_refs: dict[str, list]) -> CitationGraph:
+    """ Build the citation graph from the per-file references """
+    # Nodes are papers without revision, keyed by (category, number)
+    node_key: dict[tuple[str, int], int] = {}
+    nodes: list[str] = []
+    years: list[int] = []
+    for code, value in index_dict.items():
+        key = paper_base(code, value)
+        year = int(value["date"][:4]) if "date" in value else 0
+        if key not in node_key:
+            node_key[key] = len(nodes)
+            nodes.append(code[:code.rfind("R")] if "revision" in value else code)
+            years.append(year)
+        elif year != 0 and (years[node_key[key]] == 0 or year < years[node_key[key]]):
+            years[node_key[key]] = year
+
+    adjacency: list[set[int]] = [set() for _ in nodes]
+    for file, refs in file_refs.items():
+        code = paper_code(file)
+        if code not in index_dict:
+            continue
+        source = node_key[paper_base(code, index_dict[code])]
+        for category, number in refs:
+            target = node_key.get((category, number))
+            if target is not None and target != source:
+                adjacency[source].add(target)
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in adjacency], out=indptr[1:])
+    indices = np.fromiter((j for x in adjacency for j in sorted(x)),
+                          dtype=np.int32, count=int(indptr[-1]))
+    return CitationGraph(nodes, np.array(years, dtype=np.int32), indptr, indices)
+
+
+def update_cache(categories: tuple[str, ...], workers: int | None = None) -> dict[str, list]:
+    """ Scan new or changed files and return the per-file references """
+    cache = {"categories": [], "files": {}}
+    if os.path.exists(cache_name):
+        with open(cache_name, "r") as fp:
+            cache = json.load(fp)
+    if cache["categories"] != list(categories):
+        # Matcher changed, rescan everything
+        cache = {"categories": list(categories), "files": {}}
+
+    files = list_papers()
+    signatures = {file: file_signature(file) for file in files}
+    cached = cache["files"]
+    todo = [file for file in files
+            if file not in cached or cached[file]["signature"] != signatures[file]]
+    print(f"Scanning {len(todo)} new or changed files ({len(files) - len(todo)} cached)...")
+    if len(todo) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file, refs in executor.map(partial(extract_refs, categories), todo, chunksize=16):
+                cached[file] = {"signature": signatures[file], "refs": refs}
+
+    # Drop deleted files
+    cache["files"] = {file: cached[file] for file in files}
+    with open(cache_name, "w") as fp:
+        json.dump(cache, fp)
+    return {file: [tuple(x) for x in value["refs"]] for file, value in cache["files"].items()}
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update", action="store_true", help="Scan docs/ and rebuild the graph")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--cited-by", help="List papers citing this paper")
+    parser.add_argument("--cites", help="List papers cited by this paper")
+    parser.add_argument("--deps", help="List transitive dependencies of this paper")
+    parser.add_argument("--top", type=int, nargs="?", const=0, default=None,
+                        help="List most cited papers, optionally only by papers of a year")
+    args = parser.parse_args()
+
+    if args.update or not os.path.exists(graph_name):
+        with open("index.json", "r") as fp:
+            index_dict = json.load(fp)
+        categories = tuple(sorted({value["category"].upper() for value in index_dict.values()}))
+        graph = build_graph(index_dict, update_cache(categories, args.jobs))
+        graph.save()
+        print(f"Write {graph} to {graph_name}.")
+    else:
+        graph = CitationGraph.load()
+
+    for code, text, query in [(args.cited_by, "is cited by", graph.cited_by), (args.cites, "cites", graph.cites),
+                              (args.deps, "depends on", graph.dependencies)]:
+        if code is None:
+            continue
+        try:
+            print(f"{code} {text}: " + ", ".join(query(code)))
+        except KeyError:
+            print(f"{code}: unknown paper")
+    if args.top is not None:
+        year = None if args.top == 0 else args.top
+        print(f"Most cited papers{'' if year is None else f' in {year}'}:")
+        for code, count in graph.most_cited(year, 20):
+            print(f"{code} -> {count} citations")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Co-authorship graph over WG21 papers with sparse matrix analytics """
+
+# Libraries
+import os
+import json
+import argparse
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from author_names import AuthorTable, collect_names, split_authors, table_name
+
+
+class CoauthorGraph:
+    """ Represents author x paper incidence and the derived author x author graph """
+
+    def __init__(self, table: AuthorTable, index_dict: dict[str, dict]) -> None:
+        """ Constructor """
+        self.table = table
+        self.authors = sorted(table.members.keys())
+        self.author_index = {x: i for i, x in enumerate(self.authors)}
+
+        # One column per paper, revisions merged into their paper number and dated by the earliest
+        papers: dict[tuple[str, int], int] = {}
+        years: list[int] = []
+        rows: list[int] = []
+        cols: list[int] = []
+        for value in index_dict.values():
+            if value["type"] != "paper" or "author" not in value or "date" not in value:
+                continue
+            key = (value["category"], value["number"])
+            year = int(value["date"][:4])
+            if key not in papers:
+                papers[key] = len(years)
+                years.append(year)
+            elif year < years[papers[key]]:
+                years[papers[key]] = year
+            for name in split_authors(value):
+                author_id = table.author_id(name)
+                if author_id is not None:
+                    rows.append(self.author_index[author_id])
+                    cols.append(papers[key])
+
+        self.years = np.array(years, dtype=np.int32)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(self.authors), len(years))
+        )
+        # Several spellings of one author on a paper count once
+        incidence.data[:] = 1
+        self.incidence = incidence
+        self.matrix = self.cooccurrence()
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<CoauthorGraph {len(self.authors)} authors, {self.incidence.shape[1]} papers>"
+
+    def cooccurrence(self, year: int | None = None) -> sparse.csr_matrix:
+        """ Return the author x author joint paper counts, optionally of a single year """
+        incidence = self.incidence
+        if year is not None:
+            incidence = incidence[:, np.flatnonzero(self.years == year)]
+        return (incidence @ incidence.T).tocsr()
+
+    def adjacency(self, year: int | None = None) -> sparse.csr_matrix:
+        """ Return the boolean collaboration graph without self loops """
+        matrix = self.matrix if year is None else self.cooccurrence(year)
+        matrix = matrix - sparse.diags(matrix.diagonal())
+        matrix.eliminate_zeros()
+        return (matrix > 0).astype(np.int32).tocsr()
+
+    def top_collaborators(self, name: str, k: int = 10) -> list[tuple[str, int]]:
+        """ Return the k most frequent co-authors of an author """
+        author_id = self.table.author_id(name)
+        if author_id is None:
+            return []
+        i = self.author_index[author_id]
+        row = self.matrix.getrow(i)
+        mask = row.indices != i
+        indices, counts = row.indices[mask], row.data[mask]
+        order = np.argsort(-counts, kind="stable")[:k]
+        return [(self.table.canonical(self.authors[indices[x]]), int(counts[x])) for x in order]
+
+    def components(self, year: int | None = None) -> tuple[int, np.ndarray]:
+        """ Return the number of components and component label of every author """
+        return connected_components(self.adjacency(year), directed=False)
+
+    def metrics(self, year: int | None = None) -> dict[str, float]:
+        """ Return network metrics of the whole history or a single year """
+        adjacency = self.adjacency(year)
+        degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        papers = self.matrix.diagonal() if year is None else self.cooccurrence(year).diagonal()
+        active = papers > 0
+        count, labels = connected_components(adjacency, directed=False)
+        sizes = np.bincount(labels[active]) if active.any() else np.zeros(1, dtype=np.int64)
+        triangles = adjacency.multiply(adjacency @ adjacency).sum() / 6
+        triples = (degree * (degree - 1) / 2).sum()
+        nodes = int(active.sum())
+        edges = int(adjacency.nnz // 2)
+        return {
+            "authors": nodes,
+            "collaborations": edges,
+            "mean_degree": float(degree[active].mean()) if nodes > 0 else 0.0,
+            "density": 2 * edges / (nodes * (nodes - 1)) if nodes > 1 else 0.0,
+            # Isolated authors are components of their own
+            "components": int(count - (~active).sum()),
+            "largest_component": int(sizes.max()),
+            "transitivity": float(3 * triangles / triples) if triples > 0 else 0.0
+        }
+
+    def yearly_metrics(self) -> dict[int, dict[str, float]]:
+        """ Return metrics for every year """
+        return {int(year): self.metrics(int(year)) for year in np.unique(self.years)}
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--author", nargs="*", default=[], help="Show top collaborators of these authors")
+    parser.add_argument("-k", type=int, default=10, help="Number of collaborators")
+    args = parser.parse_args()
+
+    table = AuthorTable.load() if os.path.exists(table_name) else AuthorTable()
+    if table.refresh(collect_names(["index.json", "index-wg14.json"])) > 0:
+        table.save()
+    with open("index.json", "r") as fp:
+        graph = CoauthorGraph(table, json.load(fp))
+    print(graph)
+
+    for name in args.author:
+        print(f"Top collaborators of {name}:")
+        for other, count in graph.top_collaborators(name, args.k):
+            print(f"{other} -> {count} papers")
+
+    yearly = graph.yearly_metrics()
+    with open("coauthor_metrics.json", "w") as fp:
+        json.dump({"all": graph.metrics(), "years": yearly}, fp, indent=4)
+        print(f"Write {len(yearly)} years to coauthor_metrics.json.")
+    for year, metric in yearly.items():
+        print(f"{year}: " + ", ".join(f"{k} = {v:.3g}" for k, v in metric.items()))
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,18 @@
 """ Draw computer support graph """
 
 # Libraries
+import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
+from typing import Any
 from compiler_support import analyze_web
+from instrument import metrics
 
 
+chart_dir = "charts/"
 CPP_VERSIONS: dict[str, tuple[str | None, str]] = {
     "17": ("2017-03-21", "solid"),
     "20": ("2020-04-01", "dashed"),
@@ -114,6 +120,8 @@ COMPILER_VERSIONS = {
         "color": "tab:green"
     }
 }
+# Table kind -> (vendor name key, index in the analyze_web result)
+KINDS = {"Compiler": ("compiler_name", 0), "Library": ("library_name", 1)}
 
 
 def get_url(version: str) -> str:
@@ -121,69 +129,205 @@ def get_url(version: str) -> str:
     return f"https://en.cppreference.com/w/cpp/compiler_support/{version}"
 
 
-def main() -> None:
-    """ Main function """
-    plt.figure(figsize=(18, 10))
-    ax1 = plt.subplot(211)
-    ax2 = plt.subplot(212)
-
-    for ax, using in zip([ax1, ax2], ["Compiler", "Library"]):
-        for cpp_version, (cpp_date_str, cpp_style) in CPP_VERSIONS.items():
-            compiler, library = analyze_web(get_url(cpp_version))
-            if using == "Compiler":
-                table = compiler
-                using_key = "compiler_name"
-            else:
-                table = library
-                using_key = "library_name"
-
-            if cpp_date_str is not None:
-                cpp_date = datetime.fromisoformat(cpp_date_str)
-                ax.axvline(cpp_date,
-                           linestyle=cpp_style, color="tab:red")
-                ax.annotate(
-                    f"C++{cpp_version} Final WD"
-                    if cpp_version < "26" else "Current",
-                    (cpp_date, 105), annotation_clip=False,
-                    xytext=(-3, 0), textcoords="offset points",
-                    horizontalalignment="center",
-                    verticalalignment="bottom"
-                )
-
-            for vendor_key, vendor_data in COMPILER_VERSIONS.items():
-                vendor = vendor_data[using_key]
-                draw_data: list[tuple[datetime, float]] = []
-                for version, version_date in vendor_data["versions"].items():
-                    draw_data.append((
-                        datetime.fromisoformat(version_date),
-                        table.support_score(vendor, version)
-                    ))
-                ax.plot([x[0] for x in draw_data],
-                        [100 * x[1] for x in draw_data],
-                        color=vendor_data["color"], linestyle=cpp_style)
-
-        ax.margins(x=0)
-        ax.set_xlabel("Release Date")
-        ax.set_ylabel("Supported Feature %")
-        ax.set_ylim(0, 100)
-        ax.set_title(using)
+def support_data(snapshot: str | None = None) -> dict[str, dict[str, dict[str, list[list[Any]]]]]:
+    """ Compute every vendor's score at each of its releases, per table kind and C++ version;
+    each page is fetched (or read from a compiler_history snapshot) once """
+    if snapshot is None:
+        tables = {cpp_version: analyze_web(get_url(cpp_version)) for cpp_version in CPP_VERSIONS}
+    else:
+        from compiler_history import SupportHistory
+        history = SupportHistory()
+        tables = {cpp_version: (history.table(snapshot, cpp_version, "compiler"),
+                                history.table(snapshot, cpp_version, "library")) for cpp_version in CPP_VERSIONS}
+
+    series: dict[str, dict[str, dict[str, list[list[Any]]]]] = {}
+    for using, (using_key, index) in KINDS.items():
+        series[using] = {}
+        for cpp_version, pair in tables.items():
+            table = pair[index]
+            series[using][cpp_version] = {
+                vendor_key: [
+                    [version_date, 100 * table.support_score(vendor_data[using_key], version)]
+                    for version, version_date in vendor_data["versions"].items()
+                ] for vendor_key, vendor_data in COMPILER_VERSIONS.items()
+            }
+    return series
+
+
+def draw_axis(ax: Any, using: str, series: dict[str, dict[str, list[list[Any]]]], cpp_versions: list[str],
+              vendors: list[str], start: str | None = None, end: str | None = None) -> None:
+    """ Draw the support history of one table kind """
+    for cpp_version in cpp_versions:
+        cpp_date_str, cpp_style = CPP_VERSIONS[cpp_version]
+        if cpp_date_str is not None:
+            cpp_date = datetime.fromisoformat(cpp_date_str)
+            ax.axvline(cpp_date,
+                       linestyle=cpp_style, color="tab:red")
+            ax.annotate(
+                f"C++{cpp_version} Final WD"
+                if cpp_version < "26" else "Current",
+                (cpp_date, 105), annotation_clip=False,
+                xytext=(-3, 0), textcoords="offset points",
+                horizontalalignment="center",
+                verticalalignment="bottom"
+            )
+
+        for vendor_key in vendors:
+            draw_data = series[cpp_version][vendor_key]
+            ax.plot([datetime.fromisoformat(x[0]) for x in draw_data],
+                    [x[1] for x in draw_data],
+                    color=COMPILER_VERSIONS[vendor_key]["color"], linestyle=cpp_style)
+
+    ax.margins(x=0)
+    if start is not None or end is not None:
+        ax.set_xlim(None if start is None else datetime.fromisoformat(start),
+                    None if end is None else datetime.fromisoformat(end))
+    ax.set_xlabel("Release Date")
+    ax.set_ylabel("Supported Feature %")
+    ax.set_ylim(0, 100)
+    ax.set_title(using)
+
+
+def draw_figure(series: dict[str, dict[str, dict[str, list[list[Any]]]]], spec: dict[str, Any]) -> Any:
+    """ Draw the figure of a chart specification """
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+    fig = plt.figure(figsize=spec["size"])
+    for i, using in enumerate(spec["kinds"]):
+        ax = fig.add_subplot(len(spec["kinds"]), 1, i + 1)
+        draw_axis(ax, using, series[using], spec["cpp_versions"], spec["vendors"], spec["start"], spec["end"])
 
     # Calculate legends
     legend_lines = []
     legend_labels = []
-    for cpp_version, (_, cpp_style) in CPP_VERSIONS.items():
+    for cpp_version in spec["cpp_versions"]:
         legend_lines.append(
-            Line2D([0], [0], color="black", linestyle=cpp_style)
+            Line2D([0], [0], color="black", linestyle=CPP_VERSIONS[cpp_version][1])
         )
         legend_labels.append(f"C++{cpp_version}")
-    for vendor_key, vendor_data in COMPILER_VERSIONS.items():
+    for vendor_key in spec["vendors"]:
         legend_lines.append(
-            Line2D([0], [0], color=vendor_data["color"])
+            Line2D([0], [0], color=COMPILER_VERSIONS[vendor_key]["color"])
         )
-        legend_labels.append(vendor_data["compiler_name"])
-    plt.figlegend(legend_lines, legend_labels, loc="upper left")
-    plt.tight_layout()
-    plt.show()
+        legend_labels.append(COMPILER_VERSIONS[vendor_key]["compiler_name"])
+    fig.legend(legend_lines, legend_labels, loc="upper left")
+    fig.tight_layout()
+    return fig
+
+
+def chart_spec(spec: dict[str, Any]) -> dict[str, Any]:
+    """ Fill in the defaults of a chart specification: everything, both kinds, PNG """
+    result = {
+        "name": "support", "kinds": list(KINDS), "cpp_versions": list(CPP_VERSIONS),
+        "vendors": list(COMPILER_VERSIONS), "start": None, "end": None, "formats": ["png"],
+        "size": [18, 10 if len(spec.get("kinds", KINDS)) > 1 else 6]
+    }
+    result.update(spec)
+    return result
+
+
+def default_specs() -> list[dict[str, Any]]:
+    """ Return the published variants: everything, per kind, per standard, per vendor and the recent years """
+    specs = [{"name": "support"}, {"name": "support-since-2020", "start": "2020-01-01"}]
+    specs += [{"name": using.lower(), "kinds": [using]} for using in KINDS]
+    specs += [{"name": f"cpp{cpp_version}", "cpp_versions": [cpp_version]} for cpp_version in CPP_VERSIONS]
+    specs += [{"name": vendor_key, "vendors": [vendor_key]} for vendor_key in COMPILER_VERSIONS]
+    return specs
+
+
+def chart_inputs(series: dict[str, dict[str, dict[str, list[list[Any]]]]], spec: dict[str, Any]) -> dict:
+    """ Return the part of the support data a chart draws """
+    return {using: {cpp_version: {vendor_key: series[using][cpp_version][vendor_key]
+                                  for vendor_key in spec["vendors"]}
+                    for cpp_version in spec["cpp_versions"]}
+            for using in spec["kinds"]}
+
+
+def render_chart(job: tuple[dict[str, Any], dict, str]) -> str:
+    """ Worker: render a single chart headless into each of its formats """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    spec, inputs, output_dir = job
+    fig = draw_figure(inputs, spec)
+    for fmt in spec["formats"]:
+        fig.savefig(os.path.join(output_dir, f"{spec['name']}.{fmt}"), format=fmt)
+    plt.close(fig)
+    return spec["name"]
+
+
+def render_batch(series: dict[str, dict[str, dict[str, list[list[Any]]]]], specs: list[dict[str, Any]],
+                 output_dir: str = chart_dir, jobs: int | None = None, force: bool = False) -> list[str]:
+    """ Render charts in parallel, skipping those whose inputs and specification did not change """
+    manifest_file = os.path.join(output_dir, "charts.json")
+    manifest: dict[str, str] = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r") as fp:
+            manifest = json.load(fp)
+
+    # Unreleased versions are dated today, which alone should not redraw every chart each day
+    today = json.dumps(datetime.now().date().isoformat())
+    todo = []
+    digests = {}
+    for spec in specs:
+        inputs = chart_inputs(series, spec)
+        text = json.dumps([spec, inputs], sort_keys=True).replace(today, '"now"')
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        outputs = [os.path.join(output_dir, f"{spec['name']}.{fmt}") for fmt in spec["formats"]]
+        if not force and manifest.get(spec["name"]) == digest and all(os.path.exists(x) for x in outputs):
+            print(f"Skipping {spec['name']}, unchanged")
+            metrics().count("charts_skipped")
+            continue
+        todo.append((spec, inputs, output_dir))
+        digests[spec["name"]] = digest
+
+    os.makedirs(output_dir, exist_ok=True)
+    rendered = []
+    if len(todo) > 0:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for name in executor.map(render_chart, todo):
+                print(f"Rendered {name}", flush=True)
+                manifest[name] = digests[name]
+                rendered.append(name)
+        metrics().lap("render", charts=len(rendered))
+        with open(manifest_file, "w") as fp:
+            json.dump(manifest, fp, indent=4)
+    return rendered
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", nargs="?", const="", default=None, metavar="SPECS",
+                        help="Render charts headless into --output: the published variants, "
+                             "or the specifications of a JSON file")
+    parser.add_argument("-o", "--output", default=chart_dir, help="Output directory of --batch")
+    parser.add_argument("--format", nargs="+", default=None, help="Output formats of --batch, like png svg")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--force", action="store_true", help="Render even unchanged charts")
+    parser.add_argument("--snapshot", default=None,
+                        help="Use a compiler-history snapshot (number or date) instead of fetching")
+    args = parser.parse_args()
+
+    series = support_data(args.snapshot)
+    metrics().lap("support_data")
+    if args.batch is None:
+        import matplotlib.pyplot as plt
+        draw_figure(series, chart_spec({}))
+        plt.show()
+        return
+
+    if args.batch == "":
+        specs = default_specs()
+    else:
+        with open(args.batch, "r") as fp:
+            specs = json.load(fp)
+    specs = [chart_spec(spec) for spec in specs]
+    if args.format is not None:
+        for spec in specs:
+            spec["formats"] = args.format
+    rendered = render_batch(series, specs, args.output, args.jobs, args.force)
+    print(f"Rendered {len(rendered)} of {len(specs)} charts into {args.output}.")
 
 
 # Call main
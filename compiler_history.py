@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Snapshots of the cppreference compiler support tables, with each distinct feature row stored once """
+
+# Libraries
+import os
+import re
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Any
+from compiler_support import Feature, FeatureTable, analyze_web
+from compiler_draw import CPP_VERSIONS, get_url
+
+
+history_dir = "compiler_history/"
+feature_file = os.path.join(history_dir, "features.jsonl")
+snapshot_file = os.path.join(history_dir, "snapshots.jsonl")
+KINDS = ["compiler", "library"]
+
+
+def feature_hash(obj: dict[str, Any]) -> str:
+    """ Return the hash of a serialized feature """
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def keyed(names: list[str]) -> list[str]:
+    """ Make feature names unique within a table by numbering repeats """
+    seen: dict[str, int] = {}
+    result = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        result.append(name if seen[name] == 1 else f"{name} #{seen[name]}")
+    return result
+
+
+class SupportHistory:
+    """ Represents all snapshots; a snapshot lists feature hashes per C++ version and table """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        self.snapshots: list[dict[str, Any]] = []
+        if os.path.exists(snapshot_file):
+            with open(snapshot_file, "r") as fp:
+                self.snapshots = [json.loads(x) for x in fp if x.strip() != ""]
+        # hash -> serialized feature, only loaded when needed
+        self._features: dict[str, dict[str, Any]] | None = None
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<SupportHistory {len(self.snapshots)} snapshots>"
+
+    @property
+    def features(self) -> dict[str, dict[str, Any]]:
+        """ All distinct feature rows by hash """
+        if self._features is None:
+            self._features = {}
+            if os.path.exists(feature_file):
+                with open(feature_file, "r") as fp:
+                    for line in fp:
+                        if line.strip() != "":
+                            entry = json.loads(line)
+                            self._features[entry["hash"]] = entry["feature"]
+        return self._features
+
+    def resolve(self, name: str | int) -> int:
+        """ Return the index of a snapshot number (like 3, #1234 or -1 for the last) or of the last snapshot
+        taken on or before a date (like 2025 or 2025-06-01) """
+        # Up to 3 digits is a number, longer ones are years unless written #N
+        if isinstance(name, int) or re.fullmatch(r"-\d+|\d{1,3}|#\d+", name) is not None:
+            index = int(name.lstrip("#")) if isinstance(name, str) else name
+            if index < 0:
+                index += len(self.snapshots)
+            if not 0 <= index < len(self.snapshots):
+                raise KeyError(f"No snapshot {name}")
+            return index
+        matching = [i for i, x in enumerate(self.snapshots) if x["time"][:len(name)] <= name]
+        if len(matching) == 0:
+            raise KeyError(f"No snapshot on or before {name}")
+        return matching[-1]
+
+    def record(self, tables: dict[str, tuple[FeatureTable, FeatureTable]]) -> tuple[dict[str, Any] | None, int]:
+        """ Record a snapshot of (compiler, library) tables per C++ version if anything changed,
+        return it and the number of new feature rows """
+        snapshot: dict[str, Any] = {"time": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+        new_rows = []
+        for version, pair in tables.items():
+            snapshot["tables"][version] = {}
+            for kind, table in zip(KINDS, pair):
+                hashes = []
+                for feature in table.features:
+                    obj = feature.to_json_object()
+                    digest = feature_hash(obj)
+                    if digest not in self.features:
+                        self.features[digest] = obj
+                        new_rows.append({"hash": digest, "feature": obj})
+                    hashes.append(digest)
+                snapshot["tables"][version][kind] = {"title": table.title, "vendors": table.vendors,
+                                                     "features": hashes}
+        if len(self.snapshots) > 0 and self.snapshots[-1]["tables"] == snapshot["tables"]:
+            return None, 0
+
+        os.makedirs(history_dir, exist_ok=True)
+        with open(feature_file, "a") as fp:
+            for row in new_rows:
+                fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+        with open(snapshot_file, "a") as fp:
+            fp.write(json.dumps(snapshot) + "\n")
+        self.snapshots.append(snapshot)
+        return snapshot, len(new_rows)
+
+    def table(self, snapshot: int | str, version: str, kind: str) -> FeatureTable:
+        """ Rebuild a feature table of a snapshot """
+        entry = self.snapshots[self.resolve(snapshot)]["tables"][version][kind]
+        return FeatureTable(entry["title"], entry["vendors"],
+                            [Feature.from_json_object(self.features[x]) for x in entry["features"]])
+
+    def diff(self, old: int | str, new: int | str) -> list[dict[str, Any]]:
+        """ Per-feature, per-vendor changes between two snapshots; only rows whose hash changed are decoded """
+        old_tables = self.snapshots[self.resolve(old)]["tables"]
+        new_tables = self.snapshots[self.resolve(new)]["tables"]
+        changes: list[dict[str, Any]] = []
+        for version in sorted(set(old_tables) | set(new_tables), key=int):
+            for kind in KINDS:
+                old_hashes = old_tables.get(version, {}).get(kind, {}).get("features", [])
+                new_hashes = new_tables.get(version, {}).get(kind, {}).get("features", [])
+                if old_hashes == new_hashes:
+                    continue
+                old_rows = dict(zip(keyed([self.features[x]["name"] for x in old_hashes]), old_hashes))
+                new_rows = dict(zip(keyed([self.features[x]["name"] for x in new_hashes]), new_hashes))
+                base = {"version": version, "kind": kind}
+                for name in old_rows.keys() - new_rows.keys():
+                    changes.append(dict(base, feature=name, change="removed"))
+                for name, digest in new_rows.items():
+                    if name not in old_rows:
+                        changes.append(dict(base, feature=name, change="added"))
+                        continue
+                    if old_rows[name] == digest:
+                        continue
+                    before = Feature.from_json_object(self.features[old_rows[name]])
+                    after = Feature.from_json_object(self.features[digest])
+                    if before.papers != after.papers:
+                        changes.append(dict(base, feature=name, change="papers", old=before.papers, new=after.papers))
+                    for vendor in sorted(before.support.keys() | after.support.keys()):
+                        old_support = before.support.get(vendor)
+                        new_support = after.support.get(vendor)
+                        old_entries = [] if old_support is None else old_support.to_json_object()
+                        new_entries = [] if new_support is None else new_support.to_json_object()
+                        if old_entries == new_entries:
+                            continue
+                        old_state = "none" if old_support is None else old_support.state()
+                        new_state = "none" if new_support is None else new_support.state()
+                        if old_state == "none":
+                            change = "newly supported"
+                        elif old_state == "partial" and new_state == "full":
+                            change = "partial -> full"
+                        elif new_state == "none" or (old_state == "full" and new_state == "partial"):
+                            change = "regressed"
+                        else:
+                            change = "versions"
+                        changes.append(dict(base, feature=name, vendor=vendor, change=change,
+                                            old=old_entries, new=new_entries))
+        return changes
+
+    def scores(self, vendors: list[str] | None = None) -> list[dict[str, Any]]:
+        """ Support score of each vendor per snapshot, C++ version and table, for charting """
+        result = []
+        # Unchanged tables keep their scores
+        cache: dict[tuple[str, ...], dict[str, float]] = {}
+        for index, snapshot in enumerate(self.snapshots):
+            entry: dict[str, Any] = {"time": snapshot["time"], "scores": {}}
+            for version, pair in snapshot["tables"].items():
+                for kind, table_entry in pair.items():
+                    key = (version, kind, *table_entry["vendors"], *table_entry["features"])
+                    if key not in cache:
+                        table = self.table(index, version, kind)
+                        cache[key] = {vendor: table.support_score(vendor) for vendor in table.vendors}
+                    for vendor, score in cache[key].items():
+                        if vendors is None or vendor in vendors:
+                            entry["scores"][f"C++{version} {kind} {vendor}"] = score
+            result.append(entry)
+        return result
+
+
+def fetch_tables() -> dict[str, tuple[FeatureTable, FeatureTable]]:
+    """ Fetch and parse the support tables of every C++ version """
+    return {version: analyze_web(get_url(version)) for version in CPP_VERSIONS}
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", action="store_true", help="Fetch all tables and record them if changed")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), default=None,
+                        help="Changes between two snapshots (numbers like 3 or #1234, -1 for the last, or dates)")
+    parser.add_argument("--scores", nargs="*", metavar="VENDOR", default=None,
+                        help="Support scores of (some) vendors for every snapshot")
+    args = parser.parse_args()
+
+    history = SupportHistory()
+    if args.snapshot:
+        snapshot, rows = history.record(fetch_tables())
+        if snapshot is None:
+            print("Support tables unchanged since the last snapshot.")
+        else:
+            print(f"Recorded snapshot {len(history.snapshots) - 1} with {rows} new feature rows "
+                  f"({len(history.features)} distinct rows in total).")
+            if len(history.snapshots) >= 2:
+                args.diff = args.diff or ["-2", "-1"]
+
+    if args.diff is not None:
+        for change in history.diff(*args.diff):
+            text = f"C++{change['version']} {change['kind']}: {change['feature']}: {change['change']}"
+            if "vendor" in change:
+                text += f" for {change['vendor']}"
+            if "old" in change:
+                text += f" ({change['old']} -> {change['new']})"
+            print(text)
+    elif args.scores is not None:
+        for entry in history.scores(args.scores or None):
+            print(entry["time"] + ": " + ", ".join(f"{k} {100 * v:.1f}%" for k, v in entry["scores"].items()))
+    elif not args.snapshot:
+        for index, snapshot in enumerate(history.snapshots):
+            rows = sum(len(x["features"]) for pair in snapshot["tables"].values() for x in pair.values())
+            print(f"{index:>4}  {snapshot['time']}  {len(snapshot['tables'])} versions, {rows} features")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,8 @@
 
 # Libraries
 from typing import Any
-import requests
-from bs4 import BeautifulSoup
+from http_client import http_get
+from instrument import metrics
 
 
 class Support:
@@ -29,6 +29,21 @@ class Support:
         """ Return true if no support """
         return len(self.support) == 0
 
+    def state(self) -> str:
+        """ Return none, partial or full, after the newest entry """
+        if self.empty():
+            return "none"
+        return "partial" if self.support[-1][1] else "full"
+
+    def to_json_object(self) -> list[list[Any]]:
+        """ Serialize the support entries """
+        return [[version, is_partial] for version, is_partial in self.support]
+
+    @staticmethod
+    def from_json_object(vendor: str, obj: list[list[Any]]) -> "Support":
+        """ Deserialize the support entries of a vendor """
+        return Support(vendor, [(version, is_partial) for version, is_partial in obj])
+
 
 class Feature:
     """ Represents a feature """
@@ -46,6 +61,21 @@ class Feature:
             repr(s)[1:-1] for s in self.support.values() if not s.empty()
         )
 
+    def to_json_object(self) -> dict[str, Any]:
+        """ Serialize the feature """
+        return {
+            "name": self.name,
+            "papers": self.papers,
+            "support": {vendor: s.to_json_object() for vendor, s in self.support.items()}
+        }
+
+    @staticmethod
+    def from_json_object(obj: dict[str, Any]) -> "Feature":
+        """ Deserialize a feature """
+        return Feature(obj["name"], obj["papers"], {
+            vendor: Support.from_json_object(vendor, s) for vendor, s in obj["support"].items()
+        })
+
 
 class FeatureTable:
     """ Represents a feature table """
@@ -166,8 +196,12 @@ def analyze_table(title: str, table: Any) -> FeatureTable:
 
 def analyze_web(url: str) -> tuple[FeatureTable, FeatureTable]:
     """ Analyze and return the language and library feature table """
-    req = requests.get(url)
-    soup = BeautifulSoup(req.text, "lxml")
+    from bs4 import BeautifulSoup
+    with metrics().item("fetch", url) as item:
+        req = http_get(url)
+        item.update(status=req.status_code, bytes=len(req.content))
+    with metrics().item("parse_html", url):
+        soup = BeautifulSoup(req.text, "lxml")
     compiler = soup.find("table", class_="t-compiler-support-top")
     library = soup.find("table", class_="t-standard-library-support-top")
     c_title, l_title = [
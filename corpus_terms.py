@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Count terms over all downloaded papers, bucketed by year and by year and subgroup """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+from paper_text import file_signature, list_papers, paper_code, read_paper
+
+
+matrix_name = "corpus_terms.npz"
+file_matrix_name = "corpus_terms_files.npz"
+meta_name = "corpus_terms.json"
+NO_SUBGROUP = "(none)"
+CHUNK = 500
+
+
+def count_terms(file: str) -> tuple[str, dict[str, int]]:
+    """ Map step: count the words of a single file """
+    words = re.findall(r"\w+", read_paper(file).lower())
+    return file, dict(Counter(x for x in words if not x.isdigit() and len(x) <= 40))
+
+
+def paper_buckets(value: dict) -> list[str]:
+    """ Return the year bucket and the year/subgroup buckets of an index entry, like 2023 and 2023/EWG;
+    the year bucket counts a paper of several subgroups once """
+    if "date" not in value:
+        return []
+    year = value["date"][:4]
+    return [year] + ([f"{year}/{subgroup}" for subgroup in value.get("subgroup", [])] or [f"{year}/{NO_SUBGROUP}"])
+
+
+class TermCounts:
+    """ Represents the buckets x vocabulary sparse count matrix, and the files x vocabulary counts it sums up
+    so that a file can be taken out of its buckets without reading it again """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        self.vocab: dict[str, int] = {}
+        self.buckets: dict[str, int] = {}
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.int64)
+        self.totals = np.zeros(0, dtype=np.int64)
+        # file -> {"signature": ..., "buckets": [...], "row": row of file_matrix}
+        self.files: dict[str, dict] = {}
+        self.file_matrix = sparse.csr_matrix((0, 0), dtype=np.int32)
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<TermCounts {len(self.files)} files, {len(self.buckets)} buckets, {len(self.vocab)} terms>"
+
+    def _id(self, mapping: dict[str, int], key: str) -> int:
+        """ Return the id of a key, adding it if new """
+        if key not in mapping:
+            mapping[key] = len(mapping)
+        return mapping[key]
+
+    def reduce(self, results: list[tuple[str, dict[str, int]]]) -> dict[str, int]:
+        """ Reduce step: append per-file counts to the file matrix, return file -> row """
+        rows: list[np.ndarray] = []
+        cols: list[np.ndarray] = []
+        data: list[np.ndarray] = []
+        first = self.file_matrix.shape[0]
+        for i, (_, counts) in enumerate(results):
+            cols.append(np.fromiter((self._id(self.vocab, x) for x in counts), dtype=np.int64, count=len(counts)))
+            data.append(np.fromiter(counts.values(), dtype=np.int32, count=len(counts)))
+            rows.append(np.full(len(counts), i, dtype=np.int64))
+        chunk = sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))) if len(rows) > 0 else
+            ([], ([], [])), shape=(len(results), len(self.vocab)), dtype=np.int32
+        )
+        self.file_matrix.resize((first, len(self.vocab)))
+        self.file_matrix = sparse.vstack([self.file_matrix, chunk], format="csr", dtype=np.int32)
+        return {file: first + i for i, (file, _) in enumerate(results)}
+
+    def add_files(self, files: dict[str, int], buckets: dict[str, list[str]], sign: int = 1) -> None:
+        """ Add (or with sign -1 subtract) the counts of files, given by file matrix row, to their buckets """
+        pairs = [(self._id(self.buckets, bucket), i) for i, file in enumerate(files) for bucket in buckets[file]]
+        shape = (len(self.buckets), len(self.vocab))
+        self.matrix.resize(shape)
+        self.file_matrix.resize((self.file_matrix.shape[0], len(self.vocab)))
+        if len(pairs) > 0:
+            bucket_ids, file_ids = zip(*pairs)
+            membership = sparse.csr_matrix((np.full(len(pairs), sign, dtype=np.int64), (bucket_ids, file_ids)),
+                                           shape=(shape[0], len(files)))
+            self.matrix = (self.matrix + membership @ self.file_matrix[list(files.values())]).tocsr()
+            self.matrix.eliminate_zeros()
+        self.totals = np.asarray(self.matrix.sum(axis=1), dtype=np.int64).ravel()
+
+    def query(self, terms: list[str], subgroup: str | None = None) -> dict[str, tuple[int, float]]:
+        """ Return year -> (count, per million words) of the given terms """
+        ids = [self.vocab[x.lower()] for x in terms if x.lower() in self.vocab]
+        counts = np.asarray(self.matrix[:, ids].sum(axis=1)).ravel() if len(ids) > 0 else \
+            np.zeros(len(self.buckets), dtype=np.int64)
+        by_year: dict[str, list[int]] = {}
+        # Year buckets like 2023, or year/subgroup buckets like 2023/EWG
+        wanted = "" if subgroup is None else f"/{subgroup}"
+        for bucket, row in sorted(self.buckets.items()):
+            year, group = bucket[:4], bucket[4:]
+            if group != wanted:
+                continue
+            entry = by_year.setdefault(year, [0, 0])
+            entry[0] += int(counts[row])
+            entry[1] += int(self.totals[row])
+        return {year: (count, 1e6 * count / total if total > 0 else 0.0)
+                for year, (count, total) in by_year.items()}
+
+    def save(self) -> None:
+        """ Save to the npz matrix and JSON metadata """
+        # Drop the rows of changed and removed files
+        order = sorted(self.files, key=lambda x: self.files[x]["row"])
+        self.file_matrix = self.file_matrix[[self.files[x]["row"] for x in order]]
+        for row, file in enumerate(order):
+            self.files[file]["row"] = row
+        sparse.save_npz(matrix_name, self.matrix)
+        sparse.save_npz(file_matrix_name, self.file_matrix)
+        with open(meta_name, "w") as fp:
+            json.dump({"vocab": sorted(self.vocab, key=self.vocab.get),
+                       "buckets": sorted(self.buckets, key=self.buckets.get),
+                       "totals": self.totals.tolist(), "files": self.files}, fp)
+
+    @classmethod
+    def load(cls) -> "TermCounts":
+        """ Load from the npz matrix and JSON metadata """
+        counts = cls()
+        with open(meta_name, "r") as fp:
+            meta = json.load(fp)
+        counts.vocab = {x: i for i, x in enumerate(meta["vocab"])}
+        counts.buckets = {x: i for i, x in enumerate(meta["buckets"])}
+        counts.totals = np.array(meta["totals"], dtype=np.int64)
+        counts.files = meta["files"]
+        counts.matrix = sparse.load_npz(matrix_name).tocsr().astype(np.int64)
+        counts.file_matrix = sparse.load_npz(file_matrix_name).tocsr().astype(np.int32)
+        return counts
+
+
+def update(counts: TermCounts, index_dict: dict[str, dict], workers: int | None = None) -> int:
+    """ Count new and changed files; the stored counts of changed, moved and removed files are taken out of their
+    old buckets, so only files whose content changed are read again; return files changed """
+    files = [file for file in list_papers() if paper_code(file) in index_dict]
+    signatures = {file: file_signature(file) for file in files}
+    buckets = {file: paper_buckets(index_dict[paper_code(file)]) for file in files}
+
+    new = [file for file in files if file not in counts.files]
+    changed = [file for file in files if file in counts.files and counts.files[file]["signature"] != signatures[file]]
+    moved = [file for file in files if file in counts.files and file not in changed and
+             counts.files[file]["buckets"] != buckets[file]]
+    removed = [file for file in counts.files if file not in signatures]
+    old = {file: counts.files[file]["row"] for file in changed + moved + removed}
+    counts.add_files(old, {file: counts.files[file]["buckets"] for file in old}, -1)
+    print(f"Counting {len(new)} new and {len(changed)} changed files, moving {len(moved)} files...")
+
+    rows = {file: counts.files[file]["row"] for file in moved}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        todo = new + changed
+        for start in range(0, len(todo), CHUNK):
+            batch = todo[start:start + CHUNK]
+            rows.update(counts.reduce(list(executor.map(count_terms, batch, chunksize=8))))
+            print(f"  {min(start + CHUNK, len(todo))}/{len(todo)}", flush=True)
+    counts.add_files(rows, buckets)
+
+    rows.update({file: counts.files[file]["row"] for file in files if file not in rows})
+    counts.files = {file: {"signature": signatures[file], "buckets": buckets[file], "row": rows[file]}
+                    for file in files}
+    return len(new) + len(changed) + len(moved) + len(removed)
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("terms", nargs="*", help="Terms to report, summed together")
+    parser.add_argument("--update", action="store_true", help="Count new or changed files in docs/")
+    parser.add_argument("--subgroup", help="Only papers of this subgroup, like EWG")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    exists = os.path.exists(meta_name) and os.path.exists(matrix_name) and os.path.exists(file_matrix_name)
+    counts = TermCounts.load() if exists else TermCounts()
+    if args.update or not exists:
+        with open("index.json", "r") as fp:
+            index_dict = json.load(fp)
+        if update(counts, index_dict, args.jobs) > 0 or not exists:
+            counts.save()
+            print(f"Write {counts} to {matrix_name}.")
+
+    if len(args.terms) > 0:
+        print(f"Occurrences of {', '.join(args.terms)}" +
+              ("" if args.subgroup is None else f" in {args.subgroup} papers") + ":")
+        for year, (count, rate) in counts.query(args.terms, args.subgroup).items():
+            print(f"{year} -> {count} ({rate:.1f} per million words)")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Date normalisation shared by the index parsers: one precompiled pattern per date shape """
+
+# Libraries
+import re
+from datetime import date
+from typing import Callable
+
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+MONTH_NAMES = {
+    name: index + 1 for index, full in enumerate([
+        "january", "february", "march", "april", "may", "june",
+        "july", "august", "september", "october", "november", "december"
+    ]) for name in [full, MONTHS[index]]
+}
+MONTH_NAMES["sept"] = 9
+
+# Known typos in the document logs, fixed by hand
+FIXUPS = {"2020/03/38": "2020/03/28"}
+_missing = object()
+
+
+def year_of(text: str) -> int:
+    """ Return the year of a 2 or 4 digit year, two digits pivoting like strptime's %y """
+    year = int(text)
+    if len(text) == 2:
+        year += 1900 if year >= 69 else 2000
+    return year
+
+
+class DateParser:
+    """ Classifies date strings by shape, parses them directly, memoises them and collects anomalies """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        # Shape pattern -> converter of its groups to (year, month, day)
+        self.shapes: list[tuple[re.Pattern[str], Callable[..., tuple[int, int, int]]]] = [
+            # 2019-05-03, 20190503, 2005/08/29 (WG21 and WG14)
+            (re.compile(r"(\d{4})[-/]?(\d{2})[-/]?(\d{2})"), lambda y, m, d: (int(y), int(m), int(d))),
+            # 07-Nov-96, 19-Apr-2001, 11 Sep 86, 3 March, 2019 (WG14 and WG21)
+            (re.compile(r"(\d{1,2})[- ]([A-Za-z]+)\.?,?[- ](\d{4}|\d{2})"),
+             lambda d, m, y: (year_of(y), self.month(m), int(d))),
+            # May 2019, September, 2020
+            (re.compile(r"([A-Za-z]+)\.?,? (\d{4})"), lambda m, y: (int(y), self.month(m), 1)),
+        ]
+        self.cache: dict[str, date | None] = {}
+        # (kind, original, corrected) of every distinct string that needed a correction
+        self.anomalies: list[tuple[str, str, str]] = []
+        self._text = ""
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<DateParser {len(self.cache)} strings, {len(self.anomalies)} anomalies>"
+
+    def anomaly(self, kind: str, corrected: str) -> None:
+        """ Record a correction of the string being parsed """
+        self.anomalies.append((kind, self._text, corrected))
+
+    def month(self, name: str) -> int:
+        """ Return the month of a full or abbreviated name; misspellings fall back to the first three letters """
+        lowered = name.lower()
+        if lowered in MONTH_NAMES:
+            return MONTH_NAMES[lowered]
+        if lowered[:3] not in MONTHS:
+            raise ValueError(f"Unknown month {name!r} in {self._text!r}")
+        self.anomaly("month spelling", lowered[:3].capitalize())
+        return MONTHS.index(lowered[:3]) + 1
+
+    def parse(self, text: str) -> date | None:
+        """ Parse a single uncached date string """
+        self._text = text
+        stripped = " ".join(text.split())
+        if stripped.lower() == "unknown":
+            return None
+        if stripped in FIXUPS:
+            self.anomaly("known typo", FIXUPS[stripped])
+            stripped = FIXUPS[stripped]
+        for pattern, convert in self.shapes:
+            match = pattern.fullmatch(stripped)
+            if match is None:
+                continue
+            year, month, day = convert(*match.groups())
+            if month > 12:
+                # A stray leading digit, like 2016-13-01 for March
+                self.anomaly("month > 12", f"{year:04d}-0{month % 10}-{day:02d}")
+                month %= 10
+            if day == 0:
+                self.anomaly("day 00", f"{year:04d}-{month:02d}-01")
+                day = 1
+            return date(year, month, day)
+        raise ValueError(f"Unknown date format {text!r}")
+
+    def __call__(self, text: str) -> date | None:
+        """ Return the date of a string (None for unknown), memoised """
+        result = self.cache.get(text, _missing)
+        if result is _missing:
+            result = self.cache[text] = self.parse(text)
+        return result  # type: ignore
+
+    def report(self) -> list[str]:
+        """ Return a line per corrected string """
+        return [f"{kind}: {original!r} -> {corrected}" for kind, original, corrected in self.anomalies]
+
+
+_parser = DateParser()
+
+
+def normalize_date(text: str) -> date | None:
+    """ Parse a date string in any of the index formats with the shared parser """
+    return _parser(text)
+
+
+def date_parser() -> DateParser:
+    """ Return the shared parser, for its anomaly report """
+    return _parser
+
+
+def print_anomalies(source: str) -> None:
+    """ Print the anomaly report of the shared parser, if any """
+    lines = _parser.report()
+    if len(lines) > 0:
+        print(f"{len(lines)} date anomalies corrected in {source}:")
+        print("\n".join("  " + line for line in lines))
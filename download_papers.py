@@ -4,13 +4,10 @@
 
 import os
 import json
-import requests
 from io import BytesIO
-from bs4 import BeautifulSoup
-from http.cookiejar import MozillaCookieJar
-from tqdm import tqdm
-from pypdf import PdfReader
-from pypdf.errors import PdfReadError
+from blob_store import BlobStore
+from http_client import http_get
+from instrument import metrics
 
 
 store_dir = "docs/"
@@ -18,6 +15,8 @@ store_dir = "docs/"
 
 def main() -> None:
     """ Main function """
+    from http.cookiejar import MozillaCookieJar
+    from tqdm import tqdm
     os.makedirs(store_dir, exist_ok=True)
     index_dict = json.load(open("index.json", "r"))
     total_length = len([
@@ -28,59 +27,79 @@ def main() -> None:
     cookies = MozillaCookieJar("wg21-cookie.txt")
     cookies.load()
 
+    store = BlobStore()
     new_files = []
-    with tqdm(desc="Downloading Papers", total=total_length) as bar:
-        for name, data in index_dict.items():
-            if data["type"] not in ["paper", "standing-document"]:
-                continue
-            if "long_link" in data:
-                link = data["long_link"]
-                ext = link[link.rfind("."):].lower()
-                if data["type"] == "standing-document":
-                    ext = ".html"
-                if ext in [".ps"] or (
-                    data["type"] == "paper" and
-                    link.rfind(".") <= link.rfind("/")
+    try:
+        with tqdm(desc="Downloading Papers", total=total_length) as bar:
+            for name, data in index_dict.items():
+                if data["type"] not in ["paper", "standing-document"]:
+                    continue
+                if "long_link" in data:
+                    link = data["long_link"]
+                    ext = link[link.rfind("."):].lower()
+                    if data["type"] == "standing-document":
+                        ext = ".html"
+                    if ext in [".ps"] or (
+                        data["type"] == "paper" and
+                        link.rfind(".") <= link.rfind("/")
+                    ):
+                        bar.write(f"Link for {name} leads to invalid file!")
+                        continue
+                    elif ext in [".asc"]:
+                        ext = ".txt"
+                    if ext not in [".pdf", ".htm", ".html", ".md", ".txt"]:
+                        bar.write(f"Unknown extension {ext} for {name}!")
+                        return
+                else:
+                    bar.write(f"No link exist for {name}!")
+                    continue
+                file_name = name + ext
+                if not file_name.startswith("SD") and os.path.exists(
+                    os.path.join(store_dir, file_name)
                 ):
-                    bar.write(f"Link for {name} leads to invalid file!")
+                    bar.write(f"Skipping {file_name}...")
                     continue
-                elif ext in [".asc"]:
-                    ext = ".txt"
-                if ext not in [".pdf", ".htm", ".html", ".md", ".txt"]:
-                    bar.write(f"Unknown extension {ext} for {name}!")
-                    return
-            else:
-                bar.write(f"No link exist for {name}!")
-                continue
-            file_name = name + ext
-            if not file_name.startswith("SD") and os.path.exists(
-                os.path.join(store_dir, file_name)
-            ):
-                bar.write(f"Skipping {file_name}...")
-                continue
-            bar.update()
-            bar.set_description(f"Downloading {file_name}")
-            req = requests.get(link, cookies=cookies, allow_redirects=True)
-            if req.status_code != 200:
-                bar.write(f"{file_name}: Error: {req}")
-                continue
-            if ext == ".pdf":
-                try:
-                    with BytesIO(req.content) as fp:
-                        PdfReader(fp)
-                except PdfReadError:
-                    bar.write(f"{file_name}: Invalid PDF!")
+                linked = store.copy(os.path.join("working-drafts", file_name), os.path.join(store_dir, file_name))
+                if linked is not None:
+                    # Working drafts are also papers, no need to download twice
+                    bar.write(f"Linked {file_name} from working-drafts/")
+                    new_files.append(file_name)
+                    metrics().count("files_linked")
                     continue
-            elif ext == ".html" or ext == ".htm":
-                soup = BeautifulSoup(req.content, "html.parser")
-                if soup.title is not None and "Foswiki login" in soup.title.text:
-                    bar.write(f"{file_name}: HTML Require login!")
+                bar.update()
+                bar.set_description(f"Downloading {file_name}")
+                with metrics().item("download", file_name) as item:
+                    req = http_get(link, cookies=cookies)
+                    item.update(status=req.status_code, bytes=len(req.content))
+                if req.status_code != 200:
+                    bar.write(f"{file_name}: Error: {req}")
                     continue
-            with open(os.path.join(store_dir, file_name), "wb") as fp:
-                for chunk in req.iter_content(chunk_size=128):
-                    fp.write(chunk)
-            new_files.append(file_name)
-
+                if ext == ".pdf":
+                    from pypdf import PdfReader
+                    from pypdf.errors import PdfReadError
+                    try:
+                        with BytesIO(req.content) as fp:
+                            PdfReader(fp)
+                    except PdfReadError:
+                        bar.write(f"{file_name}: Invalid PDF!")
+                        continue
+                elif ext == ".html" or ext == ".htm":
+                    from bs4 import BeautifulSoup
+                    soup = BeautifulSoup(req.content, "html.parser")
+                    if soup.title is not None and "Foswiki login" in soup.title.text:
+                        bar.write(f"{file_name}: HTML Require login!")
+                        continue
+                _, changed = store.put(os.path.join(store_dir, file_name), req.content)
+                if len(new_files) % 100 == 99:
+                    store.save()
+                if not changed:
+                    # Re-downloaded standing document without any change
+                    metrics().count("files_unchanged")
+                    continue
+                new_files.append(file_name)
+                metrics().count("files_downloaded")
+    finally:
+        store.save()
     print("\nTotal downloaded files:", len(new_files))
     print("Names:", ", ".join(new_files))
 
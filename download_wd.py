@@ -6,12 +6,14 @@
 # Library
 import os
 import json
-import requests
+import argparse
+from blob_store import BlobStore
+from http_client import http_get
+from instrument import metrics
 
 
-def main() -> None:
-    """ Main function """
-    json_dict = json.load(open("index.json", "r"))
+def working_drafts(json_dict: dict[str, dict]) -> dict[str, dict]:
+    """ Return the working draft entries of the index """
     wd_dict = {}
     for code, value in json_dict.items():
         if ("Working Draft, Standard for Programming Language C++" in value["title"] or
@@ -19,22 +21,47 @@ def main() -> None:
             "Working Draft, Programming Languages \u2014 C++" in value["title"]) and not \
                 "Editor's Report" in value["title"]:
             wd_dict[code] = value
+    return wd_dict
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--list", action="store_true", help="Only list the working drafts")
+    args = parser.parse_args()
+
+    wd_dict = working_drafts(json.load(open("index.json", "r")))
+    if args.list:
+        for code, value in wd_dict.items():
+            downloaded = os.path.exists(f"working-drafts/{code}.pdf")
+            print(f"{code} {value.get('date', '')}" + ("" if downloaded else " (not downloaded)"))
+        return
 
+    store = BlobStore()
     total_len = len(wd_dict)
     i = 1
-    for code, value in wd_dict.items():
-        print(f"[{i:>{len(str(total_len))}}/{total_len}] Downloading {code}...", end="", flush=True)
-        i += 1
-        if os.path.exists(f"working-drafts/{code}.pdf"):
-            print(" Downloaded", flush=True)
-            continue
-        req = requests.get(value["long_link"], allow_redirects=True)
-        if req.status_code != 200:
-            print(" Failed!", flush=True)
-            continue
-        with open(f"working-drafts/{code}.pdf", "wb") as fp:
-            fp.write(req.content)
-        print(" Done!", flush=True)
+    try:
+        for code, value in wd_dict.items():
+            print(f"[{i:>{len(str(total_len))}}/{total_len}] Downloading {code}...", end="", flush=True)
+            i += 1
+            if os.path.exists(f"working-drafts/{code}.pdf"):
+                print(" Downloaded", flush=True)
+                continue
+            if store.copy(f"docs/{code}.pdf", f"working-drafts/{code}.pdf") is not None:
+                # Already downloaded as a paper
+                print(" Linked from docs/", flush=True)
+                metrics().count("linked")
+                continue
+            with metrics().item("download", code) as item:
+                req = http_get(value["long_link"])
+                item.update(status=req.status_code, bytes=len(req.content))
+            if req.status_code != 200:
+                print(" Failed!", flush=True)
+                continue
+            store.put(f"working-drafts/{code}.pdf", req.content)
+            print(" Done!", flush=True)
+    finally:
+        store.save()
 
 
 # Call main
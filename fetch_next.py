@@ -5,27 +5,30 @@
 
 # Library
 import json
-import requests
 from functools import partial
 from io import BytesIO
-from tqdm import tqdm
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
+from http_client import http_get
+from instrument import metrics
 
 
-def fetch_single(json_dict: dict[str, dict], keys: tuple[str, str | None]) -> str:
-    """ Fetch single document """
+def fetch_single(json_dict: dict[str, dict], keys: tuple[str, str | None]) -> tuple[str, bool]:
+    """ Fetch single document, return whether it is available """
+    from tqdm import tqdm
     key, orig_key = keys
-    req = requests.get(f"https://wg21.link/{key}", allow_redirects=True)
+    with metrics().item("probe", key) as item:
+        req = http_get(f"https://wg21.link/{key}")
+        item.update(status=req.status_code, bytes=len(req.content))
     if req.status_code == 200:
         if orig_key is None:
             if "html" in req.headers["content-type"]:
+                from bs4 import BeautifulSoup
                 html = BeautifulSoup(req.text, "lxml")
                 if html.title is None:
                     title = ""
                 else:
                     title = " " + html.title.text.replace("\n", " ")
             elif "pdf" in req.headers["content-type"]:
+                from pypdf import PdfReader
                 reader = PdfReader(BytesIO(req.content))
                 if reader.metadata.title is not None:
                     title = " " + reader.metadata.title.replace("\n", " ")
@@ -36,12 +39,11 @@ def fetch_single(json_dict: dict[str, dict], keys: tuple[str, str | None]) -> st
             tqdm.write(f"New paper available: {key}{title}")
         else:
             tqdm.write(f"Next revision {key} available for {orig_key}: " + json_dict[orig_key]["title"])
-    return key
+    return key, req.status_code == 200
 
 
-def main() -> None:
-    """ Main function """
-    json_dict = json.load(open("index.json", "r"))
+def next_candidates(json_dict: dict[str, dict], count: int = 99) -> list[tuple[str, str | None]]:
+    """ Return the next unused paper numbers to probe, as (key, original key) """
     last_version = {}
     max_num = -1
     for key, data in json_dict.items():
@@ -55,19 +57,26 @@ def main() -> None:
         if num != 4000 and num > max_num:
             max_num = num
 
-    worker = []
+    worker: list[tuple[str, str | None]] = []
     # for basic, revision in last_version.items():
     #     worker.append((f"{basic}R{revision + 1}", f"{basic}R{revision}"))
-    for new_num in range(max_num + 1, max_num + 100):
+    for new_num in range(max_num + 1, max_num + 1 + count):
         worker.append((f"P{new_num}R0", None))
+    return worker
+
+
+def main() -> None:
+    """ Main function """
+    from tqdm import tqdm
+    json_dict = json.load(open("index.json", "r"))
+    worker = next_candidates(json_dict)
 
     with tqdm(total=len(worker)) as bar:
-        for result in map(partial(fetch_single, json_dict), worker):
+        for result, _ in map(partial(fetch_single, json_dict), worker):
             bar.set_description(result)
             bar.update()
 
 
 # Call main
 if __name__ == "__main__":
-    from fetch_next import fetch_single
     main()
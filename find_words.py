@@ -9,13 +9,39 @@ import json
 import sys
 import re
 import argparse
-from pypdf import PdfReader
+from functools import partial
+from typing import TYPE_CHECKING
+from instrument import bounded_map, metrics
+from paper_text import page_texts
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+
+def count_words(reader: "PdfReader", words: list[str]) -> dict[str, int]:
+    """ Count all words and each of the given words in a draft """
+    total = {word: 0 for word in words}
+    total["total"] = 0
+    for text in page_texts(reader):
+        total["total"] += len(re.findall(r'\w+', text))
+        for word in words:
+            total[word] += sum(1 for _ in re.finditer(fr'\b{re.escape(word)}\b', text))
+    return total
+
+
+def count_draft(words: list[str], code: str) -> dict[str, int]:
+    """ Worker: count words in a single working draft """
+    from pypdf import PdfReader
+    return count_words(PdfReader(f"working-drafts/{code}.pdf"), words)
 
 
 def main() -> None:
     """ Main function """
     parser = argparse.ArgumentParser()
     parser.add_argument("--update", action="store_true", help="Update for new working drafts")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (default 1, 0 for one per CPU)")
+    parser.add_argument("--max-rss", type=float, default=None,
+                        help="Memory ceiling in MiB for all workers together; fewer run at once to stay below")
     args = parser.parse_args()
 
     # Read indexes
@@ -31,22 +57,24 @@ def main() -> None:
 
     # Find words
     orig_dict = json.load(open("wd_index.json", "r"))
+    todo = []
     for code in (orig_dict.keys() if args.update else wd_dict.keys()):
         if args.update and code in wd_dict and \
                 "words_count" in wd_dict[code] and len(new_words) == 0:
             print(f"Skipping {code}...", flush=True)
+            metrics().count("drafts_skipped")
             continue
-        print(f"Searching {code}...", end="", flush=True)
-        reader = PdfReader(f"working-drafts/{code}.pdf")
-        total = {word: 0 for word in words}
-        total["total"] = 0
-        for page in reader.pages:
-            text = page.extract_text()
-            total["total"] += len(re.findall(r'\w+', text))
-            for word in words:
-                total[word] += sum(1 for _ in re.finditer(fr'\b{re.escape(word)}\b', text))
-
-        print(" Done! " + ", ".join([f"{k} = {v}" for k, v in total.items()]), flush=True)
+        todo.append(code)
+
+    print(f"Searching {len(todo)} drafts...", flush=True)
+    results = {}
+    for code, total, peak in bounded_map(partial(count_draft, words), todo, args.jobs, args.max_rss, "draft"):
+        print(f"{code} Done! " + ", ".join([f"{k} = {v}" for k, v in total.items()]) +
+              ("" if peak is None else f" (peak RSS {peak:.0f} MiB)"), flush=True)
+        results[code] = total
+
+    for code in todo:
+        total = results[code]
         if code not in wd_dict:
             wd_dict[code] = orig_dict[code]
             if "sections" in wd_dict[code]:
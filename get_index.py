@@ -5,10 +5,11 @@
 
 # Libraries
 from collections import Counter
-from datetime import date, datetime
-from typing import Optional
 import json
-import requests
+from date_formats import normalize_date, print_anomalies
+from http_client import http_get
+from index_history import record_snapshot
+from instrument import metrics
 
 
 name_aliases: dict[str, list[str]] = {
@@ -90,37 +91,8 @@ def process_subgroup(subgroup_str: str) -> list[str]:
     return sorted(sg_list2)
 
 
-def regularize_date(date_str: str) -> Optional[date]:
-    """ Regularize date strings """
-    if "unknown" == date_str.lower():
-        return None
-    if "-" in date_str:
-        # try to parse as yyyy-mm-dd
-        date_str = date_str.replace("-", "")
-        assert date_str.isdigit(), date_str
-        if int(date_str[4:6]) > 12:
-            print(f"Warning: change {date_str} to ", end="")
-            date_str = date_str[:4] + "0" + date_str[5:]
-            print(date_str)
-        return date.fromisoformat(date_str)
-
-    # try to parse as dd mmm yyyy
-    date_str = date_str.replace("Sept", "Sep").replace("Sepember", "Sep").replace(",", "")
-    if not date_str[0].isdigit():
-        try:
-            return datetime.strptime(date_str, "%b %Y").date()
-        except ValueError:
-            return datetime.strptime(date_str, "%B %Y").date()
-    try:
-        return datetime.strptime(date_str, "%d %b %Y").date()
-    except ValueError:
-        return datetime.strptime(date_str, "%d %B %Y").date()
-
-
-def main() -> None:
-    """ Main function """
-    req = requests.get("https://wg21.link/index.json")
-    json_dict = req.json()
+def normalize_index(json_dict: dict[str, dict]) -> dict[str, dict]:
+    """ Normalize the raw wg21.link index """
     json_dict_new = {}
 
     # Add several useful values
@@ -143,7 +115,7 @@ def main() -> None:
             value["number"] = int(code_left)
 
         if "date" in value:
-            result = regularize_date(value["date"])
+            result = normalize_date(value["date"])
             if result is None:
                 del value["date"]
             else:
@@ -173,11 +145,25 @@ def main() -> None:
             assert False, (code, value)
 
         json_dict_new[code] = value
+    return json_dict_new
+
+
+def main() -> None:
+    """ Main function """
+    req = http_get("https://wg21.link/index.json")
+    json_dict = req.json()
+    metrics().lap("fetch", bytes=len(req.content))
+    json_dict_new = normalize_index(json_dict)
+    metrics().lap("process", entries=len(json_dict_new))
+    print_anomalies("index.json")
 
     # Write to file
     with open("index.json", "w") as fp:
         json.dump(json_dict_new, fp, indent=4)
         print(f"Write {len(json_dict_new)} entries to index.json.")
+    metrics().lap("write")
+    record_snapshot("index.json", json_dict_new)
+    metrics().lap("history")
 
     # Give an occurrence count
     groups: list[str] = []
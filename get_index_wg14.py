@@ -4,48 +4,17 @@
 """ Get the WG14 index file """
 
 # Libraries
-from datetime import date, datetime
-from bs4 import BeautifulSoup
 import json
-import requests
+from date_formats import normalize_date, print_anomalies
+from http_client import http_get
+from index_history import record_snapshot
+from instrument import metrics
 
 
-def regularize_date(date_str: str) -> date | None:
-    """ Regularize date strings """
-    # Formats: 11 Sep 86, 07-Nov-96, 19-Apr-2001, 2005/08/29
-    if "/" in date_str:
-        if date_str == "2020/03/38":
-            date_str = "2020/03/28"
-
-        # try to parse as yyyy/mm/dd
-        date_str = date_str.replace("/", "")
-        assert date_str.isdigit(), date_str
-        return date.fromisoformat(date_str)
-    if "-" in date_str:
-        # try to parse as dd-mmm-yy[yy]
-        if date_str.startswith("00-"):
-            print(f"Warning: Correcting {date_str} to first day")
-            date_str = "01-" + date_str[3:]
-        try:
-            return datetime.strptime(date_str, "%d-%b-%y").date()
-        except ValueError:
-            return datetime.strptime(date_str, "%d-%b-%Y").date()
-
-    # try to parse as dd mmm yy[yy]
-    if date_str.startswith("00 "):
-        print(f"Warning: Correcting {date_str} to first day")
-        date_str = "01 " + date_str[3:]
-    try:
-        return datetime.strptime(date_str, "%d %b %y").date()
-    except ValueError:
-        return datetime.strptime(date_str, "%d %b %Y").date()
-
-
-def main() -> None:
-    """ Main function """
-    req = requests.get("https://www.open-std.org/jtc1/sc22/wg14/www/wg14_document_log")
-    assert req.status_code == 200, req
-    soup = BeautifulSoup(req.text, "lxml")
+def parse_log(html: str) -> dict[str, dict]:
+    """ Parse the WG14 document log page """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
     lines = [x.strip() for x in soup.body.text.splitlines()]
     lines = [x for x in lines if x.startswith("N")]
     links = list(soup.body.find_all("a"))
@@ -74,7 +43,7 @@ def main() -> None:
             # Assume dd mmm yy
             date_index = line.index(" ", date_index + 1)
             date_index = line.index(" ", date_index + 1)
-        value["date"] = str(regularize_date(line[:date_index].strip()))
+        value["date"] = str(normalize_date(line[:date_index].strip()))
         line = line[date_index + 1:].strip()
 
         # Assume first comma is author
@@ -98,11 +67,25 @@ def main() -> None:
             value["long_link"] = "https://www.open-std.org/jtc1/sc22/wg14/www/" + long_links[0].attrs["href"]
 
         json_dict_new[code] = value
+    return json_dict_new
+
+
+def main() -> None:
+    """ Main function """
+    req = http_get("https://www.open-std.org/jtc1/sc22/wg14/www/wg14_document_log")
+    assert req.status_code == 200, req
+    metrics().lap("fetch", bytes=len(req.content))
+    json_dict_new = parse_log(req.text)
+    metrics().lap("parse", entries=len(json_dict_new))
+    print_anomalies("the WG14 document log")
 
     # Write to file
     with open("index-wg14.json", "w") as fp:
         json.dump(json_dict_new, fp, indent=4)
         print(f"Write {len(json_dict_new)} entries to index-wg14.json.")
+    metrics().lap("write")
+    record_snapshot("index-wg14.json", json_dict_new)
+    metrics().lap("history")
 
 
 # Call main
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Shared HTTP client: pooled sessions, per-host limits, retries and record/replay cache """
+
+# Libraries
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any
+from urllib.parse import urlsplit
+from blob_store import blob_path, write_blob
+
+
+cache_dir = "http_cache/"
+# live: network only; record: network, store every response; cache: stored response if any,
+# else network and store successes; replay: stored responses only, never the network
+MODES = ["live", "record", "cache", "replay"]
+RETRY_STATUS = [429, 500, 502, 503, 504]
+KEPT_HEADERS = ["content-type", "etag", "last-modified", "content-disposition"]
+
+
+class CachedResponse:
+    """ Represents a stored response, with the parts of requests.Response the scripts use """
+
+    def __init__(self, url: str, status_code: int, headers: dict[str, str], content: bytes) -> None:
+        """ Constructor """
+        from requests.structures import CaseInsensitiveDict
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<CachedResponse [{self.status_code}]>"
+
+    @property
+    def encoding(self) -> str:
+        """ Encoding from the content type, like requests """
+        from requests.utils import get_encoding_from_headers
+        return get_encoding_from_headers(self.headers) or "utf-8"
+
+    @property
+    def text(self) -> str:
+        """ Decoded body """
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        """ Parsed JSON body """
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1) -> Any:
+        """ Iterate over the body in chunks """
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class HostLimit:
+    """ Represents the concurrency and rate limit of a single host """
+
+    def __init__(self, concurrency: int, interval: float) -> None:
+        """ Constructor """
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def __enter__(self) -> "HostLimit":
+        """ Wait for a free slot and for the rate limit """
+        self.semaphore.acquire()
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """ Release the slot """
+        self.semaphore.release()
+
+
+class Client:
+    """ Represents the shared HTTP client """
+
+    def __init__(self, mode: str | None = None, concurrency: int = 4, interval: float = 0.2,
+                 retries: int = 4, backoff: float = 1.0, timeout: tuple[float, float] = (10, 120)) -> None:
+        """ Constructor """
+        self.mode = mode or os.environ.get("WG21_HTTP_MODE", "live")
+        assert self.mode in MODES, self.mode
+        self.concurrency = concurrency
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Redirect hosts to a local stand-in server, like "https://wg21.link=http://localhost:8000"
+        self.rewrite = dict(
+            x.split("=", 1) for x in os.environ.get("WG21_HTTP_REWRITE", "").split(",") if "=" in x
+        )
+        self.limits: dict[str, HostLimit] = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0, "cache_misses": 0, "bytes": 0}
+
+    def session(self) -> Any:
+        """ Return the pooled session of the current thread """
+        if not hasattr(self.local, "session"):
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.local.session = session
+        return self.local.session
+
+    def limit(self, url: str) -> HostLimit:
+        """ Return the limit of the host of a URL """
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.limits:
+                self.limits[host] = HostLimit(self.concurrency, self.interval)
+            return self.limits[host]
+
+    def _count(self, key: str, value: int = 1) -> None:
+        """ Update a statistic """
+        with self.lock:
+            self.stats[key] += value
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        """ Return the cache key of a request """
+        return hashlib.sha256(f"GET {url}".encode()).hexdigest()
+
+    def load(self, url: str) -> CachedResponse | None:
+        """ Return the stored response of a URL, if any """
+        key = self.cache_key(url)
+        meta_file = os.path.join(cache_dir, "index", key[:2], f"{key}.json")
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file, "r") as fp:
+            meta = json.load(fp)
+        with open(blob_path(meta["sha256"], os.path.join(cache_dir, "blobs")), "rb") as fp:
+            return CachedResponse(meta["url"], meta["status_code"], meta["headers"], fp.read())
+
+    def store(self, url: str, response: Any) -> None:
+        """ Store a response, the body under its content hash so equal bodies are kept once """
+        digest, _ = write_blob(response.content, os.path.join(cache_dir, "blobs"))
+        key = self.cache_key(url)
+        meta_file = os.path.join(cache_dir, "index", key[:2], f"{key}.json")
+        os.makedirs(os.path.dirname(meta_file), exist_ok=True)
+        with open(meta_file, "w") as fp:
+            json.dump({
+                "url": response.url, "status_code": response.status_code, "sha256": digest,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+            }, fp)
+
+    def fetch(self, url: str, **kwargs: Any) -> Any:
+        """ GET over the network with retries and exponential backoff """
+        import requests
+        for prefix, target in self.rewrite.items():
+            if url.startswith(prefix):
+                url = target + url[len(prefix):]
+                break
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("allow_redirects", True)
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            try:
+                with self.limit(url):
+                    self._count("requests")
+                    response = self.session().get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    self._count("bytes", len(response.content))
+                    return response
+                retry_after = response.headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            self._count("retries")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        """ GET a URL according to the mode """
+        if self.mode in ["cache", "replay"]:
+            cached = self.load(url)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+            self._count("cache_misses")
+            if self.mode == "replay":
+                return CachedResponse(url, 404, {}, b"")
+        response = self.fetch(url, **kwargs)
+        if self.mode == "record" or (self.mode == "cache" and response.status_code == 200):
+            self.store(url, response)
+        return response
+
+
+_client: Client | None = None
+
+
+def get_client() -> Client:
+    """ Return the process-wide client """
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
+
+def http_get(url: str, **kwargs: Any) -> Any:
+    """ GET a URL through the shared client """
+    return get_client().get(url, **kwargs)
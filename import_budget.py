@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Regression check of import time: scripts must not load heavy dependencies at import """
+
+# Libraries
+import os
+import sys
+import argparse
+import subprocess
+
+
+# Modules that must import quickly, and what none of them may load at import time
+LIGHT_MODULES = [
+    "wg21", "get_index", "get_index_wg14", "parse_location", "download_papers", "download_wd",
+    "fetch_next", "generate_index", "analyze_wd", "find_words", "compiler_support", "compiler_draw",
+    "paper_text", "http_client", "instrument", "blob_store", "index_history",
+    "compiler_history", "date_formats", "section_join", "wd_diff", "author_names", "query_server", "benchmark",
+    "import_budget"
+]
+# Modules exempt from the budget, with the reason
+EXEMPT_MODULES = {
+    module: "numerical analysis over numpy/scipy arrays, which it needs for any command"
+    for module in ["activity_cube", "citation_graph", "coauthor_graph", "corpus_terms", "meeting_assign",
+                   "paper_similarity", "section_matrix", "title_search"]
+}
+HEAVY_PACKAGES = ["requests", "bs4", "lxml", "pypdf", "tqdm", "matplotlib", "numpy", "scipy"]
+BUDGET_MS = 50.0
+
+
+def import_time(module: str, repeat: int = 3) -> tuple[float, set[str]]:
+    """ Return the best cumulative import time (ms) of a module and all packages it loaded """
+    best = float("inf")
+    packages: set[str] = set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not cumulative.strip().isdigit():
+                # Header line
+                continue
+            packages.add(name.strip().split(".")[0])
+            if name.strip() == module:
+                best = min(best, int(cumulative) / 1000)
+    return best, packages
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="Budget per module in ms")
+    parser.add_argument("modules", nargs="*", default=LIGHT_MODULES, help="Modules to check")
+    args = parser.parse_args()
+
+    failures = []
+    # Every script has to be checked or exempt, so new ones cannot slip past
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for file in sorted(os.listdir(directory)):
+        module = os.path.splitext(file)[0]
+        if file.endswith(".py") and module not in LIGHT_MODULES and module not in EXEMPT_MODULES:
+            failures.append(module)
+            print(f"{module:<20} FAIL: neither in LIGHT_MODULES nor in EXEMPT_MODULES", flush=True)
+    for module in args.modules:
+        elapsed, packages = import_time(module)
+        heavy = sorted(x for x in HEAVY_PACKAGES if x in packages)
+        status = "OK"
+        if len(heavy) > 0:
+            status = "FAIL: imports " + ", ".join(heavy)
+        elif elapsed > args.budget:
+            status = f"FAIL: over {args.budget:.0f} ms budget"
+        if status != "OK":
+            failures.append(module)
+        print(f"{module:<20} {elapsed:>8.1f} ms  {status}", flush=True)
+
+    if len(failures) > 0:
+        print(f"{len(failures)} modules failed the import budget: " + ", ".join(failures))
+        sys.exit(1)
+    print(f"All {len(args.modules)} modules within the import budget.")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
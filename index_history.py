@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Versioned history of index.json and index-wg14.json as per-entry deltas with periodic checkpoints """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+from datetime import datetime
+from typing import Any, Iterator
+
+
+history_dir = "index_history/"
+CHECKPOINT_EVERY = 16
+
+
+def entry_delta(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """ Return the fields set and unset from one version of an entry to the next """
+    delta: dict[str, Any] = {}
+    changed = {key: value for key, value in new.items() if old.get(key, None) != value or key not in old}
+    unset = [key for key in old if key not in new]
+    if len(changed) > 0:
+        delta["set"] = changed
+    if len(unset) > 0:
+        delta["unset"] = unset
+    return delta
+
+
+def index_delta(old: dict[str, dict], new: dict[str, dict]) -> dict[str, Any]:
+    """ Return the per-entry delta between two versions of an index """
+    changed = {}
+    for code, value in new.items():
+        if code in old and old[code] != value:
+            changed[code] = entry_delta(old[code], value)
+    return {
+        "added": {code: value for code, value in new.items() if code not in old},
+        "removed": [code for code in old if code not in new],
+        "changed": changed
+    }
+
+
+def apply_delta(index: dict[str, dict], delta: dict[str, Any], only: set[str] | None = None) -> None:
+    """ Apply a delta in place, restricted to some entries if given """
+    for code in delta["removed"]:
+        index.pop(code, None)
+    for code, value in delta["added"].items():
+        if only is None or code in only:
+            index[code] = value
+    for code, change in delta["changed"].items():
+        if only is not None and code not in only:
+            continue
+        value = dict(index[code])
+        value.update(change.get("set", {}))
+        for key in change.get("unset", []):
+            del value[key]
+        index[code] = value
+
+
+def newest_mailing(index: dict[str, dict]) -> str | None:
+    """ Return the month (YYYY-MM) of the newest dated paper, naming the mailing a snapshot belongs to """
+    dates = [value["date"] for value in index.values() if value.get("type") == "paper" and "date" in value]
+    return max(dates)[:7] if len(dates) > 0 else None
+
+
+class IndexHistory:
+    """ Represents the history of a single index file """
+
+    def __init__(self, file: str, checkpoint_every: int = CHECKPOINT_EVERY) -> None:
+        """ Constructor """
+        self.file = file
+        self.directory = os.path.join(history_dir, os.path.splitext(os.path.basename(file))[0])
+        self.checkpoint_every = checkpoint_every
+        self.delta_file = os.path.join(self.directory, "deltas.jsonl")
+        self.version_file = os.path.join(self.directory, "versions.json")
+        # One record per version: version, time, label, entries, offset of its delta line, counts
+        self.versions: list[dict[str, Any]] = []
+        if os.path.exists(self.version_file):
+            with open(self.version_file, "r") as fp:
+                self.versions = json.load(fp)
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<IndexHistory {self.file}: {len(self.versions)} versions>"
+
+    def __len__(self) -> int:
+        """ Number of versions """
+        return len(self.versions)
+
+    def checkpoint_file(self, version: int) -> str:
+        """ Return the path of a full checkpoint """
+        return os.path.join(self.directory, f"checkpoint-{version:06d}.json")
+
+    def resolve(self, name: str | int) -> int:
+        """ Return the version of a version number (like 3, #1234 or -1 for the last), or the last version of a
+        mailing label or year (like 2024-06 or 2024) or before it """
+        # Up to 3 digits is a number, longer ones are years unless written #N
+        if isinstance(name, int) or re.fullmatch(r"-\d+|\d{1,3}|#\d+", name) is not None:
+            version = int(name.lstrip("#")) if isinstance(name, str) else name
+            if version < 0:
+                version += len(self.versions)
+            if not 0 <= version < len(self.versions):
+                raise KeyError(f"No version {name} of {self.file}")
+            return version
+        matching = [x["version"] for x in self.versions if x["label"] is not None and x["label"][:len(name)] <= name]
+        if len(matching) == 0:
+            raise KeyError(f"No version of {self.file} at or before mailing {name}")
+        return matching[-1]
+
+    def deltas(self, start: int, stop: int) -> Iterator[dict[str, Any]]:
+        """ Yield the deltas of versions start to stop - 1, reading only those lines """
+        if start >= stop:
+            return
+        with open(self.delta_file, "r") as fp:
+            fp.seek(self.versions[start]["offset"])
+            for _ in range(start, stop):
+                yield json.loads(fp.readline())
+
+    def base(self, version: int) -> tuple[int, dict[str, dict]]:
+        """ Return the newest checkpoint at or before a version, as (version after it, index) """
+        checkpoint = version - version % self.checkpoint_every
+        while checkpoint > 0 and not os.path.exists(self.checkpoint_file(checkpoint)):
+            checkpoint -= self.checkpoint_every
+        if checkpoint <= 0:
+            return 0, {}
+        with open(self.checkpoint_file(checkpoint), "r") as fp:
+            return checkpoint + 1, json.load(fp)
+
+    def reconstruct(self, version: int | str = -1, only: set[str] | None = None) -> dict[str, dict]:
+        """ Rebuild the index as of a version from its checkpoint and the deltas since """
+        version = self.resolve(version)
+        start, index = self.base(version)
+        if only is not None:
+            index = {code: value for code, value in index.items() if code in only}
+        for delta in self.deltas(start, version + 1):
+            apply_delta(index, delta, only)
+        return index
+
+    def record(self, index: dict[str, dict], label: str | None = None) -> dict[str, Any] | None:
+        """ Record a new version if the index changed, return its version record """
+        previous = self.reconstruct() if len(self.versions) > 0 else {}
+        delta = index_delta(previous, index)
+        if len(self.versions) > 0 and not any(len(x) > 0 for x in delta.values()):
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        version = len(self.versions)
+        delta["version"] = version
+        with open(self.delta_file, "a") as fp:
+            fp.seek(0, os.SEEK_END)
+            offset = fp.tell()
+            fp.write(json.dumps(delta, ensure_ascii=False) + "\n")
+        if version > 0 and version % self.checkpoint_every == 0:
+            with open(self.checkpoint_file(version), "w") as fp:
+                json.dump(index, fp, ensure_ascii=False)
+
+        entry = {
+            "version": version, "time": datetime.now().isoformat(timespec="seconds"),
+            "label": label if label is not None else newest_mailing(index), "entries": len(index),
+            "offset": offset, "added": len(delta["added"]), "removed": len(delta["removed"]),
+            "changed": len(delta["changed"])
+        }
+        self.versions.append(entry)
+        with open(self.version_file + ".tmp", "w") as fp:
+            json.dump(self.versions, fp, indent=1)
+        os.replace(self.version_file + ".tmp", self.version_file)
+        return entry
+
+    def changes(self, old: int | str, new: int | str) -> dict[str, Any]:
+        """ Net changes between two versions; only entries touched in between are rebuilt """
+        old, new = self.resolve(old), self.resolve(new)
+        if old > new:
+            old, new = new, old
+        deltas = list(self.deltas(old + 1, new + 1))
+        touched = {code for delta in deltas for part in ["added", "removed", "changed"] for code in delta[part]}
+        before = self.reconstruct(old, touched)
+        after = dict(before)
+        for delta in deltas:
+            apply_delta(after, delta, touched)
+
+        changed = {}
+        for code in sorted(touched):
+            if code in before and code in after and before[code] != after[code]:
+                change = entry_delta(before[code], after[code])
+                changed[code] = {key: [before[code].get(key), after[code].get(key)]
+                                 for key in list(change.get("set", {})) + change.get("unset", [])}
+        return {
+            "old": old, "new": new,
+            "added": {code: after[code] for code in sorted(touched) if code in after and code not in before},
+            "removed": {code: before[code] for code in sorted(touched) if code in before and code not in after},
+            "changed": changed
+        }
+
+
+def record_snapshot(file: str, index: dict[str, dict], label: str | None = None) -> None:
+    """ Record a freshly written index in its history and report the delta """
+    history = IndexHistory(file)
+    entry = history.record(index, label)
+    if entry is None:
+        print(f"{file} unchanged since version {len(history) - 1}.")
+    else:
+        print(f"Recorded version {entry['version']} of {file} ({entry['label']}): "
+              f"{entry['added']} added, {entry['removed']} removed, {entry['changed']} changed.")
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default="index.json", help="Index file (index.json or index-wg14.json)")
+    parser.add_argument("--record", action="store_true", help="Record the current file as a new version")
+    parser.add_argument("--label", default=None, help="Mailing label of the recorded version (default: newest month)")
+    parser.add_argument("--show", metavar="VERSION", default=None,
+                        help="Write a past version (number like 12 or #1234, mailing or year)")
+    parser.add_argument("--changes", nargs=2, metavar=("OLD", "NEW"), default=None,
+                        help="What changed between two versions or mailings")
+    parser.add_argument("-o", "--output", default=None, help="Output file of --show/--changes (default stdout)")
+    args = parser.parse_args()
+
+    history = IndexHistory(args.file)
+    if args.record:
+        with open(args.file, "r") as fp:
+            record_snapshot(args.file, json.load(fp), args.label)
+
+    result: Any = None
+    if args.show is not None:
+        result = history.reconstruct(args.show)
+    elif args.changes is not None:
+        result = history.changes(*args.changes)
+        if args.output is None:
+            print(f"Version {result['old']} -> {result['new']}: {len(result['added'])} added, "
+                  f"{len(result['removed'])} removed, {len(result['changed'])} changed")
+            for code, value in result["added"].items():
+                print(f"  + {code}: {value.get('title', '')}")
+            for code, value in result["removed"].items():
+                print(f"  - {code}: {value.get('title', '')}")
+            for code, fields in result["changed"].items():
+                print(f"  ~ {code}: " + "; ".join(f"{key}: {old!r} -> {new!r}"
+                                                  for key, (old, new) in fields.items()))
+            return
+    elif not args.record:
+        for entry in history.versions:
+            print(f"{entry['version']:>4}  {entry['time']}  {entry['label'] or '-':<8} "
+                  f"{entry['entries']:>6} entries  +{entry['added']} -{entry['removed']} ~{entry['changed']}")
+        return
+
+    if result is not None:
+        if args.output is None:
+            print(json.dumps(result, indent=4, ensure_ascii=False))
+        else:
+            with open(args.output, "w") as fp:
+                json.dump(result, fp, indent=4, ensure_ascii=False)
+            print(f"Write to {args.output}.")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Shared instrumentation: stage and item timings, counters and peak RSS as JSON lines """
+
+# Libraries
+import os
+import sys
+import json
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+
+def current_rss() -> float | None:
+    """ Return the current resident set size in MiB, if known """
+    try:
+        with open("/proc/self/statm", "r") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss(children: bool = False) -> float | None:
+    """ Return the peak resident set size in MiB of this process (or its finished children), if known """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Kilobytes on Linux, bytes on macOS
+    return usage.ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def reset_peak_rss() -> bool:
+    """ Reset the peak resident set size of this process (Linux only), return whether it worked """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class Metrics:
+    """ Represents the metrics of a single script run """
+
+    def __init__(self, script: str = "", path: str | None = None) -> None:
+        """ Constructor; without a path nothing is written """
+        self.script = script
+        self.path = path
+        self.fp: TextIO | None = None
+        if path == "-":
+            self.fp = sys.stderr
+        elif path is not None:
+            self.fp = open(path, "a")
+        self.start = perf_counter()
+        self.last = self.start
+        self.counters: Counter[str] = Counter()
+        # stage -> [count, total seconds, max seconds]
+        self.totals: dict[str, list[float]] = {}
+        # Highest peak RSS seen, since items reset the process peak
+        self.peak = 0.0
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<Metrics {self.script} -> {self.path}>"
+
+    @property
+    def enabled(self) -> bool:
+        """ Whether events are written """
+        return self.fp is not None
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """ Write a single JSON line """
+        if self.fp is None:
+            return
+        record = {"event": event, "script": self.script, "t": round(perf_counter() - self.start, 6)}
+        record.update(fields)
+        self.fp.write(json.dumps(record) + "\n")
+        self.fp.flush()
+
+    def _record(self, stage: str, seconds: float) -> None:
+        """ Update the totals of a stage """
+        total = self.totals.setdefault(stage, [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+        total[2] = max(total[2], seconds)
+
+    def lap(self, name: str, **fields: Any) -> None:
+        """ End a stage that started when the previous one ended """
+        now = perf_counter()
+        seconds = now - self.last
+        self.last = now
+        self._record(name, seconds)
+        self.emit("stage", stage=name, seconds=round(seconds, 6), rss_mb=current_rss(), **fields)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict[str, Any]]:
+        """ Time a stage of the script; fields set on the yielded dict are written with it """
+        fields: dict[str, Any] = {}
+        start = perf_counter()
+        try:
+            yield fields
+        finally:
+            self.last = perf_counter()
+            seconds = self.last - start
+            self._record(name, seconds)
+            self.emit("stage", stage=name, seconds=round(seconds, 6), rss_mb=current_rss(), **fields)
+
+    def record_item(self, stage: str, name: str, seconds: float, **fields: Any) -> None:
+        """ Record a single item measured elsewhere, e.g. in a worker process """
+        self._record(stage, seconds)
+        self.emit("item", stage=stage, name=name, seconds=round(seconds, 6), **fields)
+
+    @contextmanager
+    def item(self, stage: str, name: str) -> Iterator[dict[str, Any]]:
+        """ Time a single item (a draft, a file) of a stage; the peak RSS is that of the item if possible """
+        fields: dict[str, Any] = {}
+        self.peak = max(self.peak, peak_rss() or 0.0)
+        reset_peak_rss()
+        start = perf_counter()
+        try:
+            yield fields
+        finally:
+            seconds = perf_counter() - start
+            fields["peak_rss_mb"] = peak_rss()
+            self.peak = max(self.peak, fields["peak_rss_mb"] or 0.0)
+            self.record_item(stage, name, seconds, rss_mb=current_rss(), **fields)
+
+    def count(self, key: str, value: int = 1) -> None:
+        """ Add to a counter, like cache_hits or bytes """
+        self.counters[key] += value
+
+    def summary(self) -> dict[str, Any]:
+        """ Return the summary of the run """
+        from http_client import get_client
+        counters = dict(self.counters)
+        http = dict(get_client().stats)
+        for prefix, stats in [("", counters), ("http_", http)]:
+            lookups = stats.get("cache_hits", 0) + stats.get("cache_misses", 0)
+            if lookups > 0:
+                counters[f"{prefix}cache_hit_rate"] = round(stats.get("cache_hits", 0) / lookups, 4)
+        return {
+            "seconds": round(perf_counter() - self.start, 6),
+            "stages": {stage: {"count": int(count), "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                       for stage, (count, total, longest) in self.totals.items()},
+            "counters": counters,
+            "http": http,
+            "peak_rss_mb": max(self.peak, peak_rss() or 0.0) or None,
+            "children_peak_rss_mb": peak_rss(children=True)
+        }
+
+    def close(self) -> None:
+        """ Write the summary and close the output """
+        self.emit("summary", **self.summary())
+        if self.fp is not None and self.fp is not sys.stderr:
+            self.fp.close()
+        self.fp = None
+
+
+_metrics = Metrics()
+
+
+def _measured(func: Callable[[Any], Any], item: Any) -> tuple[Any, float, float | None]:
+    """ Worker: run func on an item, returning the result, seconds and peak RSS of the item """
+    reset_peak_rss()
+    start = perf_counter()
+    result = func(item)
+    return result, perf_counter() - start, peak_rss()
+
+
+def bounded_map(func: Callable[[Any], Any], items: Iterable[Any], workers: int | None = 1,
+                ceiling_mb: float | None = None, stage: str = "item") -> Iterator[tuple[Any, Any, float | None]]:
+    """ Map over a process pool in completion order, yielding (item, result, peak RSS in MiB);
+    with a ceiling, fewer items run at once so the workers' peak RSS stays below it; one worker by default,
+    since every worker holds a whole PDF, None for one per CPU """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    workers = workers or os.cpu_count() or 1
+    # Without a measurement yet, a ceiling starts with a single item in flight
+    limit = workers if ceiling_mb is None else 1
+    worst = 0.0
+    todo = list(items)
+    todo.reverse()
+    pending: dict[Any, Any] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < limit and len(todo) > 0:
+                item = todo.pop()
+                pending[executor.submit(_measured, func, item)] = item
+            if len(pending) == 0:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                result, seconds, peak = future.result()
+                _metrics.record_item(stage, str(item), seconds, peak_rss_mb=peak)
+                worst = max(worst, peak or 0.0)
+                yield item, result, peak
+            if ceiling_mb is not None and worst > 0:
+                allowed = max(1, min(workers, int(ceiling_mb // worst)))
+                if allowed < workers and allowed != limit:
+                    print(f"Memory ceiling {ceiling_mb:.0f} MiB with {worst:.0f} MiB per worker: "
+                          f"running {allowed} of {workers} workers", file=sys.stderr, flush=True)
+                    _metrics.emit("workers", allowed=allowed, workers=workers, worker_peak_rss_mb=worst)
+                limit = allowed
+
+
+def metrics() -> Metrics:
+    """ Return the metrics of the current run """
+    return _metrics
+
+
+def run(func: Callable[[], Any], script: str, metrics_path: str | None = None,
+        profile_path: str | None = None, top: int = 25) -> Any:
+    """ Run a script main function with metrics and, optionally, cProfile """
+    global _metrics
+    _metrics = Metrics(script, metrics_path)
+    profiler = None
+    if profile_path is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with _metrics.stage("main"):
+            return func()
+    finally:
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"\nWrite profile to {profile_path}; top {top} by cumulative time:", file=sys.stderr)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(top)
+        _metrics.close()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Assign papers to the pre-meeting or post-meeting mailing of a meeting """
+
+# Libraries
+import os
+import json
+import hashlib
+import argparse
+from collections import Counter
+from datetime import date
+import numpy as np
+from parse_location import Meeting
+
+
+cache_name = "meeting_cache.json"
+WINDOWS = ["pre", "meeting", "post"]
+
+
+def load_meetings(file: str = "meeting-locations.json") -> list[Meeting]:
+    """ Load meetings, sorted by start date """
+    with open(file, "r") as fp:
+        meetings = [Meeting.from_json_object(x) for x in json.load(fp)]
+    return sorted(meetings, key=lambda x: x.start_date)
+
+
+def meeting_name(meeting: Meeting) -> str:
+    """ Return a unique name for a meeting """
+    return f"{meeting.start_date.isoformat()} {meeting.location}"
+
+
+def assign(dates: np.ndarray, meetings: list[Meeting],
+           post_days: int) -> tuple[np.ndarray, np.ndarray]:
+    """ Assign date ordinals to (meeting index, window index), -1 if after the last meeting """
+    starts = np.array([x.start_date.toordinal() for x in meetings], dtype=np.int64)
+    ends = np.array([x.end_date.toordinal() for x in meetings], dtype=np.int64)
+
+    # Last meeting started on or before each date
+    last = np.searchsorted(starts, dates, side="right") - 1
+    last_end = np.where(last >= 0, ends[np.maximum(last, 0)], np.iinfo(np.int64).min)
+    during = dates <= last_end
+    post = ~during & (dates <= last_end + post_days)
+    pre = ~during & ~post
+
+    meeting = np.where(pre, last + 1, last)
+    meeting[meeting >= len(meetings)] = -1
+    window = np.where(during, 1, np.where(post, 2, 0)).astype(np.int8)
+    return meeting, window
+
+
+def update_assignment(index_dict: dict[str, dict], meetings: list[Meeting],
+                      post_days: int) -> dict[str, list]:
+    """ Assign new or changed papers only, returning code -> [date, meeting, window] """
+    digest = hashlib.sha1(json.dumps(
+        [meeting.to_json_object() for meeting in meetings] + [post_days]
+    ).encode()).hexdigest()
+    cache = {"meetings": digest, "papers": {}}
+    if os.path.exists(cache_name):
+        with open(cache_name, "r") as fp:
+            cache = json.load(fp)
+        if cache["meetings"] != digest:
+            # Meetings changed, everything has to be reassigned
+            cache = {"meetings": digest, "papers": {}}
+
+    # Drop papers removed from the index or no longer dated
+    papers = {code: value for code, value in cache["papers"].items()
+              if code in index_dict and "date" in index_dict[code]}
+    todo = [
+        code for code, value in index_dict.items()
+        if "date" in value and (code not in papers or papers[code][0] != value["date"])
+    ]
+    cached = len(papers) - sum(1 for code in todo if code in papers)
+    print(f"Assigning {len(todo)} new or changed papers ({cached} cached)...")
+    if len(todo) > 0:
+        dates = np.array([date.fromisoformat(index_dict[code]["date"]).toordinal() for code in todo],
+                         dtype=np.int64)
+        meeting, window = assign(dates, meetings, post_days)
+        for code, m, w in zip(todo, meeting.tolist(), window.tolist()):
+            papers[code] = [index_dict[code]["date"], meeting_name(meetings[m]) if m >= 0 else None,
+                            WINDOWS[w]]
+
+    cache["papers"] = {code: papers[code] for code in index_dict if code in papers}
+    with open(cache_name, "w") as fp:
+        json.dump(cache, fp)
+    return cache["papers"]
+
+
+def aggregate(index_dict: dict[str, dict], papers: dict[str, list]) -> dict[str, dict]:
+    """ Per-meeting and per-window aggregates of papers, authors and subgroups """
+    result: dict[str, dict] = {}
+    for code, (_, meeting, window) in papers.items():
+        if meeting is None:
+            continue
+        if meeting not in result:
+            result[meeting] = {window: {"papers": 0, "authors": Counter(), "subgroups": Counter()}
+                               for window in WINDOWS}
+        value = index_dict[code]
+        entry = result[meeting][window]
+        entry["papers"] += 1
+        entry["authors"].update(value.get("author", []))
+        entry["subgroups"].update(value.get("subgroup", []))
+
+    return {
+        meeting: {
+            window: {
+                "papers": entry["papers"],
+                "authors": len(entry["authors"]),
+                "top_authors": entry["authors"].most_common(10),
+                "subgroups": dict(entry["subgroups"].most_common())
+            } for window, entry in windows.items()
+        } for meeting, windows in sorted(result.items())
+    }
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--post-days", type=int, default=42,
+                        help="Days after a meeting still counted as its post-meeting mailing")
+    args = parser.parse_args()
+
+    with open("index.json", "r") as fp:
+        index_dict = json.load(fp)
+    meetings = load_meetings()
+    papers = update_assignment(index_dict, meetings, args.post_days)
+    result = aggregate(index_dict, papers)
+
+    with open("meeting_papers.json", "w") as fp:
+        json.dump(result, fp, indent=4, ensure_ascii=False)
+        print(f"Write {len(result)} meetings to meeting_papers.json.")
+
+    for meeting, windows in list(result.items())[-5:]:
+        print(f"{meeting}: " + ", ".join(
+            f"{window} {entry['papers']} papers / {entry['authors']} authors"
+            for window, entry in windows.items()
+        ))
+
+
+# Call main
+if __name__ == "__main__":
+    main()
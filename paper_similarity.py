@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Find near-duplicate papers and similarity between revisions """
+
+# Libraries
+import os
+import re
+import json
+import zlib
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from paper_text import file_signature, list_papers, paper_code, read_paper
+
+
+cache_name = "minhash_cache.npz"
+NUM_PERM = 128
+BANDS = 32
+SHINGLE = 5
+PRIME = (1 << 31) - 1
+
+# Fixed permutations so that cached signatures stay valid between runs
+_rng = np.random.default_rng(21)
+PERM_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+EMPTY = np.full(NUM_PERM, PRIME, dtype=np.uint32)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """ Return the hashes of all word k-shingles of a text """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    word_hash = np.fromiter((zlib.crc32(w.encode()) for w in words),
+                            dtype=np.uint64, count=len(words)) % np.uint64(PRIME)
+    if len(words) < SHINGLE:
+        return np.unique(word_hash)
+
+    # Polynomial rolling hash over each window, kept below 2^31
+    count = len(words) - SHINGLE + 1
+    result = np.zeros(count, dtype=np.uint64)
+    for k in range(SHINGLE):
+        result = (result * np.uint64(1000003) + word_hash[k:k + count]) % np.uint64(PRIME)
+    return np.unique(result)
+
+
+def minhash(file: str) -> tuple[str, np.ndarray | None]:
+    """ Compute the MinHash signature of a single file, None if it has no text """
+    hashes = shingle_hashes(read_paper(file))
+    if len(hashes) == 0:
+        return file, None
+
+    # (NUM_PERM, shingles) in chunks to bound memory on huge papers
+    signature = np.full(NUM_PERM, PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), 1 << 14):
+        chunk = hashes[start:start + (1 << 14)]
+        values = (PERM_A[:, None] * chunk[None, :] + PERM_B[:, None]) % np.uint64(PRIME)
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return file, signature.astype(np.uint32)
+
+
+def jaccard(sig1: np.ndarray, sig2: np.ndarray) -> float:
+    """ Estimate the Jaccard similarity of two signatures """
+    return float(np.mean(sig1 == sig2))
+
+
+def update_signatures(workers: int | None = None) -> tuple[list[str], np.ndarray, list[str]]:
+    """ Compute signatures of new or changed files, reusing the cache; return the files with text,
+    their signatures and the empty or unreadable files """
+    files = list_papers()
+    # Signatures are (size, mtime) or content hashes, kept as JSON strings
+    signatures = {file: json.dumps(file_signature(file)) for file in files}
+    cached: dict[str, tuple[str, np.ndarray]] = {}
+    if os.path.exists(cache_name):
+        data = np.load(cache_name)
+        for file, stat, sig in zip(data["files"].tolist(), data["stats"].tolist(), data["minhash"]):
+            cached[file] = (stat if isinstance(stat, str) else json.dumps(stat), sig)
+
+    todo = [file for file in files if file not in cached or cached[file][0] != signatures[file]]
+    print(f"Hashing {len(todo)} new or changed files ({len(files) - len(todo)} cached)...")
+    if len(todo) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file, sig in executor.map(minhash, todo, chunksize=16):
+                # Files without text are cached as all PRIME, which no real signature is
+                cached[file] = (signatures[file], EMPTY if sig is None else sig)
+
+    matrix = np.array([cached[file][1] for file in files], dtype=np.uint32).reshape(-1, NUM_PERM)
+    np.savez_compressed(cache_name, files=np.array(files),
+                        stats=np.array([signatures[file] for file in files]),
+                        minhash=matrix)
+    empty = (matrix == EMPTY).all(axis=1)
+    return [x for x, y in zip(files, empty) if not y], matrix[~empty], [x for x, y in zip(files, empty) if y]
+
+
+def lsh_candidates(matrix: np.ndarray) -> set[tuple[int, int]]:
+    """ Return candidate pairs sharing at least one LSH band """
+    rows = NUM_PERM // BANDS
+    candidates: set[tuple[int, int]] = set()
+    for band in range(BANDS):
+        buckets: dict[bytes, list[int]] = defaultdict(list)
+        band_data = np.ascontiguousarray(matrix[:, band * rows:(band + 1) * rows])
+        for i, row in enumerate(band_data):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > 200:
+                # Huge buckets are boilerplate (empty or template documents)
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+    return candidates
+
+
+def revision_similarity(index_dict: dict[str, dict], files: list[str],
+                        matrix: np.ndarray) -> dict[str, float]:
+    """ Return similarity between each revision and its previous one, like P2300R1 """
+    by_paper: dict[tuple[str, int], list[tuple[int, int]]] = defaultdict(list)
+    for i, file in enumerate(files):
+        code = paper_code(file)
+        if code not in index_dict or "revision" not in index_dict[code]:
+            continue
+        value = index_dict[code]
+        by_paper[(value["category"], value["number"])].append((value["revision"], i))
+
+    result: dict[str, float] = {}
+    for revisions in by_paper.values():
+        revisions.sort()
+        for (_, prev), (_, cur) in zip(revisions, revisions[1:]):
+            result[paper_code(files[cur])] = jaccard(matrix[prev], matrix[cur])
+    return result
+
+
+def near_duplicates(index_dict: dict[str, dict], files: list[str], matrix: np.ndarray,
+                    threshold: float) -> list[tuple[str, str, float]]:
+    """ Return similar pairs that are not revisions of the same paper """
+    def base(code: str) -> tuple[str, int] | str:
+        if code not in index_dict:
+            return code
+        return index_dict[code]["category"], index_dict[code]["number"]
+
+    result: list[tuple[str, str, float]] = []
+    for i, j in lsh_candidates(matrix):
+        code1, code2 = paper_code(files[i]), paper_code(files[j])
+        if base(code1) == base(code2):
+            continue
+        score = jaccard(matrix[i], matrix[j])
+        if score >= threshold:
+            result.append((code1, code2, score))
+    return sorted(result, key=lambda x: x[2], reverse=True)
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="Minimum similarity for near-duplicates")
+    args = parser.parse_args()
+
+    with open("index.json", "r") as fp:
+        index_dict = json.load(fp)
+    files, matrix, empty = update_signatures(args.jobs)
+
+    revisions = revision_similarity(index_dict, files, matrix)
+    duplicates = near_duplicates(index_dict, files, matrix, args.threshold)
+    with open("similarity.json", "w") as fp:
+        json.dump({
+            "revisions": revisions,
+            "duplicates": [{"code": x, "other": y, "similarity": s} for x, y, s in duplicates],
+            "empty": [paper_code(x) for x in empty]
+        }, fp, indent=4)
+        print(f"Write {len(revisions)} revisions, {len(duplicates)} duplicates and {len(empty)} papers "
+              f"without text to similarity.json.")
+
+    print("Least changed revisions:")
+    for code, score in sorted(revisions.items(), key=lambda x: x[1], reverse=True)[:10]:
+        print(f"{code} -> {score:.3f}")
+    print("Possible re-filed papers:")
+    for code1, code2, score in duplicates[:10]:
+        print(f"{code1} ~ {code2} -> {score:.3f}")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
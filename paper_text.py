@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Read plain text out of the downloaded papers """
+
+# Libraries
+import os
+from glob import glob
+from typing import TYPE_CHECKING, Iterator
+from blob_store import stored_hash
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+
+store_dir = "docs/"
+
+
+def paper_code(file: str) -> str:
+    """ Return the paper code of a file in docs/, like P2300R10 """
+    filename = os.path.basename(file)
+    return filename[:filename.find(".")]
+
+
+def list_papers(directory: str = store_dir) -> list[str]:
+    """ Return all the downloaded paper files, sorted """
+    return sorted(glob(os.path.join(directory, "*")))
+
+
+def file_signature(file: str) -> list[int] | str:
+    """ Return a cheap change signature of a file: its content hash if in the blob store, else (size, mtime) """
+    digest = stored_hash(file)
+    if digest is not None:
+        return digest
+    stat = os.stat(file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def page_texts(reader: "PdfReader", start: int = 0, stop: int | None = None) -> Iterator[str]:
+    """ Yield the text of each page in turn, dropping the page's parsed content streams afterwards
+    so memory stays flat over a whole draft; fonts and the page tree stay cached """
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for index in range(start, stop):
+        page = reader.pages[index]
+        # Objects of this page that were not parsed before it, checked before resolving them
+        fresh: set[tuple[int, int]] = set()
+
+        def note(refs: list) -> None:
+            """ Remember the unparsed ones among the references """
+            for ref in refs:
+                if isinstance(ref, IndirectObject) and (ref.generation, ref.idnum) not in reader.resolved_objects:
+                    fresh.add((ref.generation, ref.idnum))
+
+        # Either a single stream or an array of streams
+        contents = page.raw_get("/Contents") if "/Contents" in page else None
+        note([contents])
+        if isinstance(contents, IndirectObject):
+            contents = contents.get_object()
+        if isinstance(contents, ArrayObject):
+            note(list(contents))
+        resources = page.get("/Resources")
+        xobjects = resources.get("/XObject") if isinstance(resources, DictionaryObject) else None
+        if isinstance(xobjects, DictionaryObject):
+            note([xobjects.raw_get(x) for x in xobjects])
+
+        yield page.extract_text()
+        for key in fresh:
+            reader.resolved_objects.pop(key, None)
+
+
+def read_paper(file: str, strip_html: bool = True) -> str:
+    """ Read the text of a single paper, empty string if unreadable """
+    ext = file[file.rfind("."):].lower()
+    if ext == ".pdf":
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+        try:
+            reader = PdfReader(file)
+            return "\n".join(page_texts(reader))
+        except (PdfReadError, ValueError, KeyError, TypeError):
+            return ""
+
+    with open(file, "rb") as fp:
+        content = fp.read().decode("utf-8", errors="replace")
+    if strip_html and ext in [".htm", ".html"]:
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(content, "lxml").get_text(" ")
+    return content
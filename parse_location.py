@@ -19,6 +19,15 @@ class Meeting:
             "sponsor": self.sponsor,
         }
 
+    @staticmethod
+    def from_json_object(obj: dict[str, Any]) -> "Meeting":
+        return Meeting(
+            date.fromisoformat(obj["start_date"]),
+            date.fromisoformat(obj["end_date"]),
+            obj["location"],
+            obj["sponsor"],
+        )
+
 
 def main() -> None:
     locations = []
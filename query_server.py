@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Long-running query service over the indexes, refreshed in the background """
+
+# Libraries
+import os
+import re
+import sys
+import json
+import socket
+import argparse
+import threading
+import socketserver
+from bisect import bisect_right
+from datetime import datetime
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+from paper_text import file_signature
+
+
+LOCAL_FILES = ["index.json", "index-wg14.json", "wd_index.json", "word_output.json"]
+# Committees in lookup order when a query does not name one
+SOURCES = ["WG21", "WG14"]
+code_pattern = re.compile(r"^([A-Za-z]+)(\d+)(?:R(\d+))?$")
+
+
+def load_json(file: str) -> dict:
+    """ Load a JSON file, empty if missing """
+    if not os.path.exists(file):
+        return {}
+    with open(file, "r") as fp:
+        return json.load(fp)
+
+
+class Snapshot:
+    """ Represents one immutable generation of the in-memory indexes """
+
+    def __init__(self, wg21: dict[str, dict], wg14: dict[str, dict], wd: dict[str, dict],
+                 words: dict[str, dict], upcoming: list[str], generation: int) -> None:
+        """ Constructor """
+        self.wg21 = wg21
+        self.wg14 = wg14
+        self.wd = wd
+        self.words = words
+        self.upcoming = upcoming
+        self.generation = generation
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        # Both committees number N papers, so every lookup is per source
+        self.indexes = {"WG21": wg21, "WG14": wg14}
+
+        # (source, category, number) -> codes of all revisions, and sorted numbers per (source, category)
+        self.revisions: dict[tuple[str, str, int], list[str]] = {}
+        for source, index in self.indexes.items():
+            for code, value in index.items():
+                if "category" in value and "number" in value:
+                    self.revisions.setdefault((source, value["category"], value["number"]), []).append(code)
+        numbers: dict[tuple[str, str], list[int]] = {}
+        for source, category, number in self.revisions:
+            numbers.setdefault((source, category), []).append(number)
+        self.numbers = {key: sorted(values) for key, values in numbers.items()}
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<Snapshot #{self.generation}: {len(self.wg21)} WG21, {len(self.wg14)} WG14, " \
+               f"{len(self.wd)} drafts, {len(self.words)} word counts>"
+
+    def sources(self, source: str | None) -> list[str]:
+        """ Return the sources to look in, all of them in order if none is given """
+        if source is None:
+            return SOURCES
+        if source.upper() not in self.indexes:
+            raise ValueError(f"Unknown source {source!r}, expected one of {', '.join(SOURCES)}")
+        return [source.upper()]
+
+    def entry(self, code: str, source: str | None = None) -> dict | None:
+        """ Return the index entry of a code in the given index, or the first one having it """
+        code = code.upper()
+        for name in self.sources(source):
+            if code in self.indexes[name]:
+                return self.indexes[name][code]
+        return None
+
+    def paper_revisions(self, code: str, source: str | None = None) -> list[str]:
+        """ Return all revisions of a paper in the given index, or the first one having it,
+        like P2300 -> [P2300R0, ...] """
+        match = code_pattern.match(code.upper())
+        if match is None:
+            return []
+        for name in self.sources(source):
+            codes = self.revisions.get((name, match.group(1), int(match.group(2))), [])
+            if len(codes) > 0:
+                return sorted(codes, key=lambda x: self.indexes[name][x].get("revision", 0))
+        return []
+
+    def above(self, category: str, number: int, limit: int = 100, source: str | None = None) -> list[str]:
+        """ Return the papers of a category numbered above a number, lowest first, in the given index
+        or the first one having the category """
+        category = category.upper()
+        name = next((x for x in self.sources(source) if (x, category) in self.numbers), None)
+        numbers = self.numbers.get((name, category), []) if name is not None else []
+        result: list[str] = []
+        for value in numbers[bisect_right(numbers, number):]:
+            result += self.paper_revisions(f"{category}{value}", name)
+            if len(result) >= limit:
+                break
+        return result[:limit]
+
+    def latest(self) -> dict[str, dict[str, int]]:
+        """ Return the highest number of every category per source """
+        result: dict[str, dict[str, int]] = {}
+        for (source, category), values in self.numbers.items():
+            result.setdefault(source, {})[category] = values[-1]
+        return result
+
+
+class QueryService:
+    """ Represents the service state: current snapshot and background refresh """
+
+    def __init__(self, interval: float, probe: int, write: bool, online: bool) -> None:
+        """ Constructor """
+        self.interval = interval
+        self.probe = probe
+        self.write = write
+        self.online = online
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop = threading.Event()
+        self.signatures: dict[str, list[int] | None] = {}
+        self.last_refresh: dict[str, Any] = {}
+        # Title search index, loaded on first search
+        self.titles: Any = None
+        # Stable name join index and its signature, loaded on first use and whenever rebuilt
+        self.sections: Any = None
+        self.sections_signature: list[int] | str | None = None
+        data = self.load_local(None)
+        self.snapshot = Snapshot(data["index.json"], data["index-wg14.json"], data["wd_index.json"],
+                                 data["word_output.json"], [], 0)
+
+    def load_local(self, previous: Snapshot | None) -> dict[str, dict]:
+        """ Load the local JSON files, reusing those of the previous snapshot when unchanged on disk """
+        data: dict[str, dict] = {}
+        for file in LOCAL_FILES:
+            signature = file_signature(file) if os.path.exists(file) else None
+            if previous is not None and signature == self.signatures.get(file):
+                data[file] = {
+                    "index.json": previous.wg21, "index-wg14.json": previous.wg14,
+                    "wd_index.json": previous.wd, "word_output.json": previous.words
+                }[file]
+                continue
+            self.signatures[file] = signature
+            loaded = load_json(file)
+            if file == "word_output.json":
+                loaded = {code: value["words_count"] for code, value in loaded.items() if "words_count" in value}
+            data[file] = loaded
+        return data
+
+    def refresh(self) -> dict[str, Any]:
+        """ Refresh once: fetch and normalise both indexes in full, probe for new papers, reload local files """
+        from http_client import http_get
+        import get_index
+        import get_index_wg14
+        import fetch_next
+        from index_history import record_snapshot
+        previous = self.snapshot
+        report: dict[str, Any] = {"started": datetime.now().isoformat(timespec="seconds")}
+        data = self.load_local(previous)
+        wg21, wg14 = data["index.json"], data["index-wg14.json"]
+        upcoming = previous.upcoming
+        if self.online:
+            try:
+                req = http_get("https://wg21.link/index.json")
+                if req.status_code == 200:
+                    wg21 = get_index.normalize_index(req.json())
+                req = http_get("https://www.open-std.org/jtc1/sc22/wg14/www/wg14_document_log")
+                if req.status_code == 200:
+                    wg14 = get_index_wg14.parse_log(req.text)
+                upcoming = [
+                    key for key, available in map(partial(fetch_next.fetch_single, wg21),
+                                                  fetch_next.next_candidates(wg21, self.probe))
+                    if available
+                ]
+            except Exception as error:
+                report["error"] = repr(error)
+            if self.write:
+                for file, value in [("index.json", wg21), ("index-wg14.json", wg14)]:
+                    with open(file, "w") as fp:
+                        json.dump(value, fp, indent=4)
+                    self.signatures[file] = file_signature(file)
+                    record_snapshot(file, value)
+
+        snapshot = Snapshot(wg21, wg14, data["wd_index.json"], data["word_output.json"], upcoming,
+                            previous.generation + 1)
+        for name, old, new in [("wg21", previous.wg21, wg21), ("wg14", previous.wg14, wg14)]:
+            report[name] = {
+                "added": len(new.keys() - old.keys()), "removed": len(old.keys() - new.keys()),
+                "changed": sum(1 for code in new.keys() & old.keys() if new[code] != old[code])
+            }
+        report["upcoming"] = upcoming
+        report["finished"] = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.snapshot = snapshot
+            self.last_refresh = report
+        return report
+
+    def refresh_loop(self) -> None:
+        """ Background thread: refresh on schedule or when woken """
+        while not self.stop.is_set():
+            self.wake.wait(self.interval)
+            if self.stop.is_set():
+                break
+            self.wake.clear()
+            report = self.refresh()
+            print(f"Refreshed: {self.snapshot} " + json.dumps({k: report.get(k) for k in ["wg21", "wg14", "error"]}),
+                  flush=True)
+
+    def status(self) -> dict[str, Any]:
+        """ Return the service status """
+        snapshot = self.snapshot
+        return {"snapshot": repr(snapshot), "generation": snapshot.generation, "loaded_at": snapshot.loaded_at,
+                "interval": self.interval, "online": self.online, "last_refresh": self.last_refresh}
+
+
+def routes(service: QueryService) -> list[tuple[re.Pattern, Callable[..., Any]]]:
+    """ Return the GET routes: pattern -> handler(query, *groups) """
+    def snap() -> Snapshot:
+        """ Current snapshot """
+        return service.snapshot
+
+    def one(value: Any) -> Any:
+        """ Value or not found """
+        if value is None or value == []:
+            raise KeyError
+        return value
+
+    def search(query: dict[str, list[str]]) -> Any:
+        """ Fuzzy title search, if the index was built """
+        from title_search import TitleIndex, search_name
+        if "q" not in query:
+            raise ValueError("Missing query parameter q")
+        if service.titles is None and os.path.exists(search_name):
+            service.titles = TitleIndex.load()
+        if service.titles is None:
+            raise KeyError
+        return [{"source": source, "code": code, "title": title, "score": score} for source, code, title, score in
+                service.titles.search(query["q"][0], int(query.get("k", ["10"])[0]), query.get("source", [None])[0])]
+
+    def section(query: dict[str, list[str]], stable: str) -> Any:
+        """ Issues, editorial entries and draft pages of a stable name, if the join index was built """
+        from section_join import SectionIndex, index_name
+        if not os.path.exists(index_name):
+            raise KeyError
+        signature = file_signature(index_name)
+        if signature != service.sections_signature:
+            service.sections = SectionIndex()
+            service.sections_signature = signature
+        result = service.sections.query(stable, query.get("draft", [None])[0], "open" in query,
+                                        "exact" not in query)
+        return one(result if len(result["sections"]) + len(result["issues"]) + len(result["editorial"]) > 0
+                   else None)
+
+    return [(re.compile(pattern), handler) for pattern, handler in [
+        (r"/status", lambda q: service.status()),
+        (r"/latest", lambda q: snap().latest()),
+        (r"/upcoming", lambda q: snap().upcoming),
+        (r"/paper/([^/]+)", lambda q, code: one(snap().entry(code, q.get("source", [None])[0]))),
+        (r"/revisions/([^/]+)", lambda q, code: one(snap().paper_revisions(code, q.get("source", [None])[0]))),
+        (r"/above/(\d+)", lambda q, number: snap().above(
+            q.get("category", ["P"])[0], int(number), int(q.get("limit", ["100"])[0]), q.get("source", [None])[0])),
+        (r"/wd/([^/]+)", lambda q, code: one(snap().wd.get(code.upper()))),
+        (r"/words/([^/]+)", lambda q, code: one(snap().words.get(code.upper()))),
+        (r"/search", search),
+        (r"/section/([^/]+)", section),
+    ]]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Represents the HTTP handler of the query API """
+
+    service: QueryService
+    table: list[tuple[re.Pattern, Callable[..., Any]]]
+    # Keep connections open between queries, and do not wait to coalesce small replies
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        """ TCP_NODELAY only applies to TCP connections """
+        self.disable_nagle_algorithm = self.request.family != getattr(socket, "AF_UNIX", None)
+        super().setup()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """ Keep the console for refresh reports """
+
+    def reply(self, status: int, value: Any) -> None:
+        """ Send a JSON response """
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        """ Answer a query """
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        for pattern, handler in self.table:
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            try:
+                result = handler(query, *match.groups())
+            except KeyError:
+                self.reply(404, {"error": f"not found: {url.path}"})
+                return
+            except (ValueError, IndexError) as error:
+                self.reply(400, {"error": repr(error)})
+                return
+            except Exception as error:
+                self.reply(500, {"error": repr(error)})
+                return
+            self.reply(200, result)
+            return
+        self.reply(404, {"error": f"unknown query: {url.path}"})
+
+    def do_POST(self) -> None:
+        """ POST /refresh wakes the background refresh """
+        if urlsplit(self.path).path != "/refresh":
+            self.reply(404, {"error": f"unknown action: {self.path}"})
+            return
+        self.service.wake.set()
+        self.reply(202, {"refresh": "scheduled"})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ Represents the HTTP server on a Unix socket """
+
+    daemon_threads = True
+
+    def get_request(self) -> tuple[socket.socket, Any]:
+        """ Unix sockets have no client address, give the handler one to format """
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8021, help="Port to listen on")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead")
+    parser.add_argument("--interval", type=float, default=3600, help="Seconds between background refreshes")
+    parser.add_argument("--probe", type=int, default=20, help="Paper numbers to probe for on every refresh")
+    parser.add_argument("--offline", action="store_true", help="Only reload the local files on refresh")
+    parser.add_argument("--write", action="store_true", help="Write refreshed indexes back to the JSON files")
+    args = parser.parse_args()
+
+    service = QueryService(args.interval, args.probe, args.write, not args.offline)
+    Handler.service = service
+    Handler.table = routes(service)
+    if args.socket is not None:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server: socketserver.BaseServer = UnixHTTPServer(args.socket, Handler)
+        address = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), Handler)
+        address = f"http://{args.host}:{args.port}"
+
+    thread = threading.Thread(target=service.refresh_loop, daemon=True)
+    thread.start()
+    print(f"Serving {service.snapshot} on {address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping...", file=sys.stderr)
+    finally:
+        service.stop.set()
+        service.wake.set()
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+# Call main
+if __name__ == "__main__":
+    main()
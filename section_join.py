@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Join index: each [stable.name] to its issues, editorial entries and page range in every working draft """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+from bisect import bisect_left
+from typing import Any
+from instrument import bounded_map, metrics
+from paper_text import file_signature, page_texts
+
+
+index_name = "section_index.json"
+
+# A subclause heading on its own line, like "7.5.4.2 Unqualified names [expr.prim.id.unqual]" or "C.1.2 Clause 5"
+heading_line = re.compile(r"^((?:\d+|[A-F])(?:\.\d+)*)\s+(.+?)\s*\[([a-z][a-z0-9_.:]*)\]$")
+
+# Statuses of issues that are no longer open
+CLOSED_STATUSES = {
+    "c++11", "c++14", "c++17", "c++20", "c++23", "cd1", "cd2", "cd3", "cd4", "cd5", "cd6", "tc1", "tc3",
+    "wp", "dr", "drwp", "nad", "nad editorial", "nad future", "nad concepts", "nad arrays", "dup", "resolved",
+    "accepted", "closed"
+}
+
+
+def draft_file(draft: str) -> str:
+    """ Return the PDF path of a draft """
+    return f"working-drafts/{draft}.pdf"
+
+
+def is_closed(status: str) -> bool:
+    """ Whether the status of an issue or editorial entry is final; entries without a status count as open """
+    return status.strip().lower() in CLOSED_STATUSES
+
+
+def scan_draft(draft: str) -> dict[str, list[Any]]:
+    """ Worker: find every subclause heading of a draft, returning stable name -> [number, title, first page,
+    last page] with 1-based pages; a subclause ends where the next one of the same or a higher level starts """
+    from pypdf import PdfReader
+    reader = PdfReader(draft_file(draft))
+    pages = reader.get_num_pages()
+    headings: list[tuple[str, str, str, int]] = []
+    seen: set[str] = set()
+    for page, text in enumerate(page_texts(reader), start=1):
+        for line in text.splitlines():
+            match = heading_line.match(line.strip())
+            # Only the first occurrence is the heading, later ones are references or running headers
+            if match is not None and match.group(3) not in seen:
+                seen.add(match.group(3))
+                headings.append((match.group(3), match.group(1), match.group(2), page))
+
+    sections: dict[str, list[Any]] = {}
+    for i, (stable, number, title, page) in enumerate(headings):
+        depth = number.count(".")
+        end = pages
+        for _, other, _, other_page in headings[i + 1:]:
+            if other.count(".") <= depth:
+                end = other_page
+                break
+        sections[stable] = [number, title, page, end]
+    return sections
+
+
+class SectionIndex:
+    """ Represents the join of stable names to issues, editorial entries and working draft sections """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        # index.json signature, stable -> {"issues": [...], "editorial": [...]}
+        self.index_signature: Any = None
+        self.entries: dict[str, dict[str, list[str]]] = {}
+        # draft -> {"signature": ..., "sections": stable -> [number, title, first page, last page]}
+        self.drafts: dict[str, dict[str, Any]] = {}
+        # code -> [status, title] of every joined issue and editorial entry
+        self.details: dict[str, list[str]] = {}
+        self._stables: list[str] | None = None
+        if os.path.exists(index_name):
+            with open(index_name, "r") as fp:
+                data = json.load(fp)
+            self.index_signature = data["index_signature"]
+            self.entries = data["entries"]
+            self.drafts = data["drafts"]
+            self.details = data["details"]
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<SectionIndex {len(self.stables)} stable names, {len(self.drafts)} drafts>"
+
+    @property
+    def stables(self) -> list[str]:
+        """ All stable names of either side, sorted for prefix lookups """
+        if self._stables is None:
+            names = set(self.entries)
+            for draft in self.drafts.values():
+                names.update(draft["sections"])
+            self._stables = sorted(names)
+        return self._stables
+
+    def update_entries(self, file: str = "index.json") -> bool:
+        """ Rebuild the issue and editorial side if the index changed, return whether it did """
+        signature = file_signature(file)
+        if signature == self.index_signature:
+            return False
+        with open(file, "r") as fp:
+            index_dict = json.load(fp)
+        entries: dict[str, dict[str, list[str]]] = {}
+        details: dict[str, list[str]] = {}
+        for code, value in index_dict.items():
+            if value["type"] not in ["issue", "editorial"] or "section_stable" not in value:
+                continue
+            entry = entries.setdefault(value["section_stable"], {"issues": [], "editorial": []})
+            entry["issues" if value["type"] == "issue" else "editorial"].append(code)
+            details[code] = [value.get("status", ""), value.get("title", "")]
+        self.index_signature = signature
+        self.entries = entries
+        self.details = details
+        self._stables = None
+        return True
+
+    def update_drafts(self, drafts: list[str], jobs: int | None = 1, ceiling_mb: float | None = None) -> list[str]:
+        """ Rescan the drafts that are new or changed, forget removed ones, return the rescanned drafts """
+        signatures = {draft: file_signature(draft_file(draft)) for draft in drafts}
+        for draft in list(self.drafts):
+            if draft not in signatures:
+                del self.drafts[draft]
+                self._stables = None
+        todo = [draft for draft in drafts
+                if draft not in self.drafts or self.drafts[draft]["signature"] != signatures[draft]]
+        for draft, sections, peak in bounded_map(scan_draft, todo, jobs, ceiling_mb, "draft"):
+            print(f"{draft}: {len(sections)} subclauses" + ("" if peak is None else f" (peak RSS {peak:.0f} MiB)"),
+                  flush=True)
+            self.drafts[draft] = {"signature": signatures[draft], "sections": sections}
+            self._stables = None
+        return todo
+
+    def save(self) -> None:
+        """ Save the join index """
+        with open(index_name, "w") as fp:
+            json.dump({"index_signature": self.index_signature, "entries": self.entries,
+                       "drafts": self.drafts, "details": self.details}, fp)
+
+    def matching(self, stable: str, children: bool = True) -> list[str]:
+        """ Return the stable name and, if wanted, all below it, by binary search """
+        stable = stable.strip("[]")
+        stables = self.stables
+        result = []
+        i = bisect_left(stables, stable)
+        if i < len(stables) and stables[i] == stable:
+            result.append(stable)
+            i += 1
+        if children:
+            i = bisect_left(stables, stable + ".", i)
+            while i < len(stables) and stables[i].startswith(stable + "."):
+                result.append(stables[i])
+                i += 1
+        return result
+
+    def query(self, stable: str, draft: str | None = None, open_only: bool = False,
+              children: bool = True) -> dict[str, Any]:
+        """ Return the issues, editorial entries and draft sections of a stable name (and those below it);
+        with a draft, only names present in that draft """
+        result: dict[str, Any] = {"stable": stable.strip("[]"), "sections": {}, "issues": [], "editorial": []}
+        for name in self.matching(stable, children):
+            if draft is not None:
+                if name not in self.drafts.get(draft, {"sections": {}})["sections"]:
+                    continue
+                result["sections"][name] = self.drafts[draft]["sections"][name]
+            else:
+                result["sections"][name] = {
+                    code: data["sections"][name] for code, data in self.drafts.items() if name in data["sections"]
+                }
+            entry = self.entries.get(name, {"issues": [], "editorial": []})
+            for kind in ["issues", "editorial"]:
+                for code in entry[kind]:
+                    status, title = self.details[code]
+                    if open_only and is_closed(status):
+                        continue
+                    result[kind].append({"code": code, "stable": name, "status": status, "title": title})
+        return result
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stable", nargs="*", help="Stable names to look up, like expr.prim or [expr.prim]")
+    parser.add_argument("--draft", default=None, help="Only sections present in this working draft, like N5050")
+    parser.add_argument("--open", action="store_true", help="Only open issues and editorial entries")
+    parser.add_argument("--exact", action="store_true", help="Do not include the subclauses below a stable name")
+    parser.add_argument("--no-update", action="store_true", help="Query the saved index without updating it")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (default 1, 0 for one per CPU)")
+    parser.add_argument("--max-rss", type=float, default=None,
+                        help="Memory ceiling in MiB for all workers together; fewer run at once to stay below")
+    args = parser.parse_args()
+
+    index = SectionIndex()
+    if not args.no_update:
+        if index.update_entries():
+            print(f"Joined {len(index.details)} issues and editorial entries to {len(index.entries)} stable names.")
+        metrics().lap("entries")
+        with open("wd_index.json", "r") as fp:
+            drafts = [code for code in json.load(fp) if os.path.exists(draft_file(code))]
+        scanned = index.update_drafts(drafts, args.jobs, args.max_rss)
+        metrics().lap("drafts", scanned=len(scanned))
+        index.save()
+        print(f"{index}: rescanned {len(scanned)} of {len(drafts)} drafts, write {index_name}.")
+
+    for stable in args.stable:
+        result = index.query(stable, args.draft, args.open, not args.exact)
+        print(f"\n[{result['stable']}]" + ("" if args.draft is None else f" in {args.draft}") +
+              f": {len(result['sections'])} subclauses, {len(result['issues'])} issues, "
+              f"{len(result['editorial'])} editorial entries")
+        for name, section in result["sections"].items():
+            if args.draft is not None:
+                number, title, first, last = section
+                print(f"  {number} {title} [{name}]: pages {first}-{last}")
+            else:
+                print(f"  [{name}] in {len(section)} drafts")
+        for kind in ["issues", "editorial"]:
+            for entry in result[kind]:
+                print(f"  {entry['code']} [{entry['stable']}] {entry['status']}: {entry['title']}")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
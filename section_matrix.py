@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Align section names across all working drafts into a page count matrix """
+
+# Libraries
+import re
+import json
+import argparse
+import difflib
+import numpy as np
+
+
+matrix_name = "section_matrix.npz"
+PARTS = ["front", "core", "library", "annex", "back"]
+
+# Renamed clauses, by normalised title -> stable name of the clause
+STABLE_NAMES: dict[str, str] = {
+    "basics": "basic",
+    "basic concepts": "basic",
+    "thread support library": "thread",
+    "concurrency support library": "thread",
+    "date and time library": "time",
+    "time library": "time",
+    "universal character names": "uaxid",
+    "universal character names for identifier characters": "uaxid",
+    "conformance with uax #31": "uaxid",
+    "cross references": "xref",
+}
+
+
+def normalize(title: str) -> str:
+    """ Normalise a section title for matching """
+    title = re.sub(r"^TR\d+:\s*", "", title.strip())
+    return " ".join(title.lower().replace("-", " ").split())
+
+
+def section_part(titles: list[str]) -> list[str]:
+    """ Classify the sections of a single draft, in order, into PARTS """
+    result: list[str] = []
+    part = "front"
+    for title in titles:
+        key = normalize(title)
+        if part == "front" and key in ["scope", "general"]:
+            part = "core"
+        elif part == "core" and key == "library introduction":
+            part = "library"
+        elif part == "library" and key == "grammar summary":
+            part = "annex"
+        elif part == "annex" and (key.startswith("index") or key.startswith("cross references") or
+                                  key == "bibliography"):
+            part = "back"
+        result.append(part)
+    return result
+
+
+class SectionMatrix:
+    """ Represents a dense sections x drafts matrix of page counts """
+
+    def __init__(self, sections: list[str], drafts: list[str], dates: list[str],
+                 pages: np.ndarray, parts: np.ndarray) -> None:
+        """ Constructor """
+        self.sections = sections
+        self.drafts = drafts
+        self.dates = dates
+        self.pages = pages
+        # Part index per cell, -1 if the section is absent from the draft
+        self.parts = parts
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<SectionMatrix {len(self.sections)} sections x {len(self.drafts)} drafts>"
+
+    def mask(self, part: str) -> np.ndarray:
+        """ Return the boolean cell mask of a part, like core """
+        return self.parts == PARTS.index(part)
+
+    def part_pages(self, part: str) -> np.ndarray:
+        """ Return the page count of a part in every draft """
+        return np.where(self.mask(part), self.pages, 0).sum(axis=0)
+
+    def growth(self, first: str | None = None, last: str | None = None) -> dict[str, int]:
+        """ Return page growth of every section between two drafts, largest first """
+        i = 0 if first is None else self.drafts.index(first)
+        j = len(self.drafts) - 1 if last is None else self.drafts.index(last)
+        delta = self.pages[:, j].astype(np.int64) - self.pages[:, i]
+        order = np.argsort(-delta, kind="stable")
+        return {self.sections[x]: int(delta[x]) for x in order if delta[x] != 0}
+
+    def save(self, file: str = matrix_name) -> None:
+        """ Save to a npz file """
+        np.savez_compressed(file, sections=np.array(self.sections), drafts=np.array(self.drafts),
+                            dates=np.array(self.dates), pages=self.pages, parts=self.parts)
+
+    @classmethod
+    def load(cls, file: str = matrix_name) -> "SectionMatrix":
+        """ Load from a npz file """
+        data = np.load(file)
+        return cls(data["sections"].tolist(), data["drafts"].tolist(), data["dates"].tolist(),
+                   data["pages"], data["parts"])
+
+
+def build_matrix(wd_dict: dict[str, dict], cutoff: float = 0.85) -> SectionMatrix:
+    """ Build the aligned matrix from wd_index.json """
+    drafts = [code for code, prop in sorted(wd_dict.items(), key=lambda x: x[1]["date"])
+              if "sections" in prop]
+
+    # Row key -> row index; row name is the title in the latest draft
+    rows: dict[str, int] = {}
+    names: list[str] = []
+    cells: list[tuple[int, int, int, int]] = []
+    for col, code in enumerate(drafts):
+        titles = list(wd_dict[code]["sections"].keys())
+        used: set[int] = set()
+        for title, part in zip(titles, section_part(titles)):
+            key = normalize(title)
+            key = STABLE_NAMES.get(key, key)
+            if key not in rows:
+                # Fuzzy match against rows not present in this draft yet
+                free = [x for x in rows if rows[x] not in used]
+                close = difflib.get_close_matches(key, free, n=1, cutoff=cutoff)
+                if len(close) > 0:
+                    rows[key] = rows[close[0]]
+                else:
+                    rows[key] = len(names)
+                    names.append(title)
+            row = rows[key]
+            used.add(row)
+            names[row] = title
+            cells.append((row, col, wd_dict[code]["sections"][title], PARTS.index(part)))
+
+    pages = np.zeros((len(names), len(drafts)), dtype=np.int32)
+    parts = np.full((len(names), len(drafts)), -1, dtype=np.int8)
+    table = np.array(cells, dtype=np.int64).reshape(-1, 4)
+    # Duplicate titles in one draft (rare) add up
+    np.add.at(pages, (table[:, 0], table[:, 1]), table[:, 2])
+    parts[table[:, 0], table[:, 1]] = table[:, 3]
+    return SectionMatrix(names, drafts, [wd_dict[code]["date"] for code in drafts], pages, parts)
+
+
+def plot(matrix: SectionMatrix, file: str | None = None) -> None:
+    """ Plot core/library/annex page counts of every draft """
+    from datetime import datetime
+    import matplotlib.pyplot as plt
+
+    dates = [datetime.fromisoformat(x) for x in matrix.dates]
+    plt.figure(figsize=(18, 10))
+    plt.stackplot(dates, *[matrix.part_pages(part) for part in ["core", "library", "annex"]],
+                  labels=["Core", "Library", "Annex"])
+    plt.margins(x=0)
+    plt.xlabel("Draft Date")
+    plt.ylabel("Pages")
+    plt.legend(loc="upper left")
+    plt.tight_layout()
+    if file is None:
+        plt.show()
+    else:
+        plt.savefig(file)
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plot", nargs="?", const="", default=None,
+                        help="Plot the history, optionally into a file")
+    parser.add_argument("--top", type=int, default=10, help="Number of fastest growing sections")
+    args = parser.parse_args()
+
+    with open("wd_index.json", "r") as fp:
+        matrix = build_matrix(json.load(fp))
+    matrix.save()
+    print(f"Write {matrix} to {matrix_name}.")
+
+    print(f"Fastest growing sections ({matrix.drafts[0]} -> {matrix.drafts[-1]}):")
+    for section, delta in list(matrix.growth().items())[:args.top]:
+        print(f"{section} -> {delta:+} pages")
+    if args.plot is not None:
+        plot(matrix, args.plot if args.plot != "" else None)
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Fuzzy title search over WG21 and WG14 papers using a trigram index """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+from collections import Counter
+from time import perf_counter
+import numpy as np
+
+
+search_name = "title_search.npz"
+SOURCES = {"WG21": "index.json", "WG14": "index-wg14.json"}
+K1 = 1.2
+B = 0.75
+
+
+def trigrams(text: str) -> Counter:
+    """ Return the trigram counts of a text, each word padded like pg_trgm """
+    result: Counter = Counter()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class TitleIndex:
+    """ Represents a BM25-ranked trigram index over titles """
+
+    def __init__(self) -> None:
+        """ Constructor """
+        self.docs: list[tuple[str, str]] = []
+        self.titles: list[str] = []
+        self.doc_index: dict[tuple[str, str], int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.source_ids = np.zeros(0, dtype=np.int8)
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.vocab: dict[str, int] = {}
+        # Postings sorted by trigram id: (trigram, doc, tf)
+        self.post_gram = np.zeros(0, dtype=np.int32)
+        self.post_doc = np.zeros(0, dtype=np.int32)
+        self.post_tf = np.zeros(0, dtype=np.int16)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        # Precomputed BM25 term weight of every posting, and idf of every trigram
+        self.post_weight = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    def __repr__(self) -> str:
+        """ String representation """
+        return f"<TitleIndex {int(self.alive.sum())} titles, {len(self.vocab)} trigrams>"
+
+    def update(self, source: str, index_dict: dict[str, dict]) -> int:
+        """ Add new entries, re-index changed titles and drop removed ones, return the number of changes """
+        new_gram: list[int] = []
+        new_doc: list[int] = []
+        new_tf: list[int] = []
+        lengths: list[int] = []
+        stale: list[int] = []
+        first = len(self.docs)
+        for code, value in index_dict.items():
+            title = value.get("title", "")
+            key = (source, code)
+            if key in self.doc_index:
+                old = self.doc_index[key]
+                if self.titles[old] == title:
+                    continue
+                stale.append(old)
+            doc = len(self.docs)
+            self.doc_index[key] = doc
+            self.docs.append(key)
+            self.titles.append(title)
+            grams = trigrams(f"{code} {title}")
+            lengths.append(sum(grams.values()))
+            for gram, tf in grams.items():
+                if gram not in self.vocab:
+                    self.vocab[gram] = len(self.vocab)
+                new_gram.append(self.vocab[gram])
+                new_doc.append(doc)
+                new_tf.append(tf)
+
+        # Entries no longer in the source index
+        removed = [key for key in self.doc_index if key[0] == source and key[1] not in index_dict]
+        for key in removed:
+            stale.append(self.doc_index.pop(key))
+
+        added = len(self.docs) - first
+        if added == 0 and len(removed) == 0:
+            return 0
+        self.alive = np.concatenate([self.alive, np.ones(added, dtype=bool)])
+        self.alive[stale] = False
+        self.source_ids = np.concatenate([self.source_ids,
+                                          np.full(added, list(SOURCES).index(source), dtype=np.int8)])
+        self.lengths = np.concatenate([self.lengths, np.array(lengths, dtype=np.int32)])
+
+        # Merge the new postings, dropping those of replaced and removed titles
+        gram = np.concatenate([self.post_gram, np.array(new_gram, dtype=np.int32)])
+        doc = np.concatenate([self.post_doc, np.array(new_doc, dtype=np.int32)])
+        tf = np.concatenate([self.post_tf, np.array(new_tf, dtype=np.int16)])
+        keep = self.alive[doc]
+        order = np.argsort(gram[keep], kind="stable")
+        self.post_gram, self.post_doc, self.post_tf = gram[keep][order], doc[keep][order], tf[keep][order]
+        self.indptr = np.searchsorted(self.post_gram, np.arange(len(self.vocab) + 1)).astype(np.int64)
+        self._reweight()
+        return added + len(removed)
+
+    def _reweight(self) -> None:
+        """ Recompute BM25 weights after the corpus changed """
+        alive_count = int(self.alive.sum())
+        avg_length = float(self.lengths[self.alive].mean())
+        df = np.diff(self.indptr)
+        self.idf = np.log(1 + (alive_count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        tf = self.post_tf.astype(np.float32)
+        norm = K1 * (1 - B + B * self.lengths[self.post_doc] / avg_length)
+        self.post_weight = (tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+
+    def search(self, query: str, k: int = 10, source: str | None = None) -> list[tuple[str, str, str, float]]:
+        """ Return the top-k (source, code, title, score) for a query """
+        grams = [self.vocab[x] for x in trigrams(query) if x in self.vocab]
+        if len(grams) == 0:
+            return []
+        # BM25 over the union of the query trigrams' postings
+        docs = []
+        weights = []
+        for gram in grams:
+            start, end = self.indptr[gram], self.indptr[gram + 1]
+            docs.append(self.post_doc[start:end])
+            weights.append(self.post_weight[start:end] * self.idf[gram])
+        scores = np.bincount(np.concatenate(docs), weights=np.concatenate(weights),
+                             minlength=len(self.docs))
+        if source is not None:
+            scores[self.source_ids != list(SOURCES).index(source)] = 0
+
+        k = min(k, int((scores > 0).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(*self.docs[i], self.titles[i], float(scores[i])) for i in top]
+
+    def save(self, file: str = search_name) -> None:
+        """ Save to a npz file """
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        np.savez(file, docs=np.array(["\t".join(x) for x in self.docs]), titles=np.array(self.titles),
+                 alive=self.alive, lengths=self.lengths, vocab=np.array(vocab), post_gram=self.post_gram,
+                 post_doc=self.post_doc, post_tf=self.post_tf, indptr=self.indptr)
+
+    @classmethod
+    def load(cls, file: str = search_name) -> "TitleIndex":
+        """ Load from a npz file """
+        data = np.load(file)
+        index = cls()
+        index.docs = [tuple(x.split("\t", 1)) for x in data["docs"].tolist()]  # type: ignore
+        index.titles = data["titles"].tolist()
+        # Every data[...] access reads the array from the file again, so each is read once
+        alive = data["alive"]
+        index.doc_index = {x: i for i, x in enumerate(index.docs) if alive[i]}
+        index.alive = alive
+        index.source_ids = np.array([list(SOURCES).index(x) for x, _ in index.docs], dtype=np.int8)
+        index.lengths = data["lengths"]
+        index.vocab = {x: i for i, x in enumerate(data["vocab"].tolist())}
+        index.post_gram = data["post_gram"]
+        index.post_doc = data["post_doc"]
+        index.post_tf = data["post_tf"]
+        index.indptr = data["indptr"]
+        index._reweight()
+        return index
+
+
+def load_index(update: bool = False) -> TitleIndex:
+    """ Load the persistent index, refreshing it from the JSON indexes if asked or missing """
+    if os.path.exists(search_name) and not update:
+        return TitleIndex.load()
+    index = TitleIndex.load() if os.path.exists(search_name) else TitleIndex()
+    changed = 0
+    for source, file in SOURCES.items():
+        if os.path.exists(file):
+            with open(file, "r") as fp:
+                changed += index.update(source, json.load(fp))
+    if changed > 0:
+        index.save()
+        print(f"Index {changed} changed titles, write {index} to {search_name}.")
+    return index
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", nargs="*", help="Words of the title to look for")
+    parser.add_argument("--update", action="store_true", help="Index new entries of index.json and index-wg14.json")
+    parser.add_argument("-k", type=int, default=10, help="Number of results")
+    parser.add_argument("--source", choices=list(SOURCES.keys()), help="Only search one index")
+    args = parser.parse_args()
+
+    index = load_index(args.update)
+    if len(args.query) == 0:
+        return
+    start_time = perf_counter()
+    results = index.search(" ".join(args.query), args.k, args.source)
+    elapsed = perf_counter() - start_time
+    for source, code, title, score in results:
+        print(f"{code} ({source}): {title} [{score:.2f}]")
+    print(f"{len(results)} results in {elapsed * 1000:.2f} ms.")
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Section-level diff between consecutive working drafts """
+
+# Libraries
+import os
+import re
+import json
+import argparse
+import difflib
+from concurrent.futures import ProcessPoolExecutor
+from analyze_wd import outline_pages, section_title
+from paper_text import file_signature, page_texts
+from instrument import metrics
+
+
+section_dir = "wd_sections/"
+diff_dir = "wd_diff/"
+
+# Running headers/footers that change on every draft
+noise_line = re.compile(r"^(\d+|©.*|.*ISO/IEC.*|N\d{4}|§\s*[\d.]+\s+\d+)$")
+
+
+def draft_file(draft: str) -> str:
+    """ Return the PDF path of a draft """
+    return f"working-drafts/{draft}.pdf"
+
+
+def extract_sections(draft: str) -> tuple[str, dict[str, str]]:
+    """ Extract the text of each top-level section of a draft, using cache """
+    file = draft_file(draft)
+    cache_file = os.path.join(section_dir, f"{draft}.json")
+    signature = file_signature(file)
+    if os.path.exists(cache_file):
+        with open(cache_file, "r") as fp:
+            cache = json.load(fp)
+        if cache["signature"] == signature:
+            return draft, cache["sections"]
+
+    from pypdf import PdfReader
+    reader = PdfReader(file)
+    sections: dict[str, str] = {}
+    if len(reader.outline) > 0:
+        items = outline_pages(reader)
+        ends = [page for _, page in items[1:]] + [reader.get_num_pages()]
+        for (title, start), end in zip(items, ends):
+            name = section_title(title)
+            if name in sections:
+                name = f"{name} ({title.split()[0]})"
+            lines = []
+            for text in page_texts(reader, start, max(start + 1, end)):
+                lines += [x.strip() for x in text.splitlines()]
+            sections[name] = "\n".join(x for x in lines if x != "" and not noise_line.match(x))
+
+    os.makedirs(section_dir, exist_ok=True)
+    with open(cache_file, "w") as fp:
+        json.dump({"signature": signature, "sections": sections}, fp)
+    return draft, sections
+
+
+def align_sections(old_names: list[str], new_names: list[str]) -> list[tuple[str | None, str | None]]:
+    """ Align sections by exact name, then by closest name for renames """
+    new_left = [x for x in new_names if x not in old_names]
+    result: list[tuple[str | None, str | None]] = []
+    matched: set[str] = set()
+    for old in old_names:
+        if old in new_names:
+            result.append((old, old))
+            matched.add(old)
+            continue
+        close = difflib.get_close_matches(old, new_left, n=1, cutoff=0.7)
+        if len(close) > 0:
+            result.append((old, close[0]))
+            new_left.remove(close[0])
+            matched.add(close[0])
+        else:
+            result.append((old, None))
+    for new in new_names:
+        if new not in matched:
+            result.append((None, new))
+    return result
+
+
+def diff_section(old_text: str, new_text: str, context: int = 1) -> dict:
+    """ Compute the line/word-level diff of a single section """
+    if old_text == new_text:
+        return {"added_lines": 0, "removed_lines": 0, "added_words": 0, "removed_words": 0, "diff": []}
+
+    old_lines, new_lines = old_text.splitlines(), new_text.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    result = {"added_lines": 0, "removed_lines": 0, "added_words": 0, "removed_words": 0}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed, added = old_lines[i1:i2], new_lines[j1:j2]
+        if tag == "replace":
+            # Word-level diff inside changed lines, so a reflow is not a full rewrite
+            words = difflib.SequenceMatcher(None, " ".join(removed).split(), " ".join(added).split())
+            same = sum(block.size for block in words.get_matching_blocks())
+            result["removed_words"] += len(words.a) - same
+            result["added_words"] += len(words.b) - same
+        else:
+            result["removed_words"] += sum(len(x.split()) for x in removed)
+            result["added_words"] += sum(len(x.split()) for x in added)
+        result["removed_lines"] += len(removed)
+        result["added_lines"] += len(added)
+    result["diff"] = list(difflib.unified_diff(old_lines, new_lines, n=context, lineterm=""))[2:]
+    return result
+
+
+def diff_drafts(old: str, new: str) -> dict:
+    """ Produce the full change report of a draft against its predecessor, using cache """
+    cache_file = os.path.join(diff_dir, f"{old}-{new}.json")
+    signature = [file_signature(draft_file(old)), file_signature(draft_file(new))]
+    if os.path.exists(cache_file):
+        with open(cache_file, "r") as fp:
+            cache = json.load(fp)
+        if cache["signature"] == signature:
+            return cache["report"]
+
+    _, old_sections = extract_sections(old)
+    _, new_sections = extract_sections(new)
+    report = {"old": old, "new": new, "sections": []}
+    for old_name, new_name in align_sections(list(old_sections.keys()), list(new_sections.keys())):
+        entry = diff_section(old_sections.get(old_name, ""), new_sections.get(new_name, ""))
+        entry["old_name"] = old_name
+        entry["new_name"] = new_name
+        report["sections"].append(entry)
+
+    os.makedirs(diff_dir, exist_ok=True)
+    with open(cache_file, "w") as fp:
+        json.dump({"signature": signature, "report": report}, fp, indent=4)
+    return report
+
+
+def diff_pair(pair: tuple[str, str]) -> dict:
+    """ Worker for a single pair of drafts """
+    return diff_drafts(*pair)
+
+
+def main() -> None:
+    """ Main function """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("drafts", nargs="*", help="Drafts to report against their predecessor")
+    parser.add_argument("--all", action="store_true", help="Diff every pair of consecutive drafts")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--show", action="store_true", help="Print the textual diff")
+    args = parser.parse_args()
+
+    # Drafts ordered by date, only those with an outline and a local PDF
+    with open("wd_index.json", "r") as fp:
+        wd_dict = json.load(fp)
+    drafts = [
+        code for code, prop in sorted(wd_dict.items(), key=lambda x: x[1]["date"])
+        if "sections" in prop and os.path.exists(draft_file(code))
+    ]
+    pairs = list(zip(drafts, drafts[1:]))
+    if not args.all:
+        wanted = args.drafts if len(args.drafts) > 0 else drafts[-1:]
+        pairs = [pair for pair in pairs if pair[1] in wanted]
+
+    needed = sorted({draft for pair in pairs for draft in pair})
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        # Extract each draft once, then diff pairs in parallel
+        list(executor.map(extract_sections, needed))
+        metrics().lap("extract", drafts=len(needed))
+        reports = list(executor.map(diff_pair, pairs))
+        metrics().lap("diff", pairs=len(pairs))
+
+    for report in reports:
+        changed = [x for x in report["sections"] if x["added_words"] + x["removed_words"] > 0]
+        print(f"{report['old']} -> {report['new']}: {len(changed)} sections changed")
+        for entry in sorted(changed, key=lambda x: x["added_words"] + x["removed_words"], reverse=True):
+            name = entry["new_name"] if entry["old_name"] is None else entry["old_name"]
+            if entry["old_name"] is not None and entry["new_name"] is not None and \
+                    entry["old_name"] != entry["new_name"]:
+                name = f"{entry['old_name']} => {entry['new_name']}"
+            print(f"  {name}: +{entry['added_words']} -{entry['removed_words']} words")
+            if args.show:
+                print("\n".join("    " + x for x in entry["diff"]))
+
+
+# Call main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Single entry point for all the scripts: wg21 <command> [args...] """
+
+# Libraries
+import sys
+from importlib import import_module
+
+
+# Command -> (module, description); modules are only imported when run
+COMMANDS: dict[str, tuple[str, str]] = {
+    "index": ("get_index", "Download and normalise the WG21 index.json"),
+    "index-wg14": ("get_index_wg14", "Download and normalise the WG14 document log"),
+    "history": ("index_history", "Versioned history of the indexes (--changes OLD NEW, --show VERSION)"),
+    "locations": ("parse_location", "Parse meeting-locations.txt"),
+    "download-papers": ("download_papers", "Download all WG21 papers into docs/"),
+    "download-wd": ("download_wd", "Download (or --list) all working drafts"),
+    "blobs": ("blob_store", "Deduplicated document store (--adopt existing files, --gc)"),
+    "fetch-next": ("fetch_next", "Probe for new paper numbers"),
+    "docset": ("generate_index", "Generate the SQLite docset index"),
+    "analyze-wd": ("analyze_wd", "Analyze the working drafts into wd_index.json"),
+    "find-words": ("find_words", "Count words in the working drafts"),
+    "wd-diff": ("wd_diff", "Section-level diff between working drafts"),
+    "sections": ("section_matrix", "Aligned section-size matrix across drafts"),
+    "stable-names": ("section_join", "Issues, editorial entries and draft pages of a [stable.name]"),
+    "compiler-support": ("compiler_support", "Show the current compiler support ranking"),
+    "compiler-draw": ("compiler_draw", "Draw the compiler support history"),
+    "compiler-history": ("compiler_history", "Snapshots of the support tables (--snapshot, --diff, --scores)"),
+    "citations": ("citation_graph", "Citation graph between papers"),
+    "similarity": ("paper_similarity", "Near-duplicate and revision similarity"),
+    "meetings": ("meeting_assign", "Assign papers to meeting mailings"),
+    "cube": ("activity_cube", "Activity trends by subgroup, category and type"),
+    "search": ("title_search", "Fuzzy title search"),
+    "authors": ("author_names", "Resolve author name spellings"),
+    "coauthors": ("coauthor_graph", "Co-authorship network analytics"),
+    "terms": ("corpus_terms", "Term trends over all papers"),
+    "serve": ("query_server", "Query service over the indexes with background refresh"),
+    "bench": ("benchmark", "Benchmark the hot paths on synthetic fixtures"),
+    "import-budget": ("import_budget", "Check the import time of every script"),
+}
+
+
+def usage() -> str:
+    """ Return the usage text """
+    width = max(len(x) for x in COMMANDS)
+    return "usage: wg21 [--metrics FILE] [--profile FILE] <command> [args...]\n\n" \
+        "options:\n  --metrics FILE  Write stage/item timings, counters and peak RSS as JSON lines (- for stderr)\n" \
+        "  --profile FILE  Run under cProfile, dump the stats to FILE and print the hot spots\n\n" \
+        "commands:\n" + "\n".join(
+        f"  {command:<{width}}  {description}" for command, (_, description) in COMMANDS.items()
+    )
+
+
+def main() -> None:
+    """ Main function """
+    args = sys.argv[1:]
+    options: dict[str, str | None] = {"--metrics": None, "--profile": None}
+    while len(args) >= 2 and args[0] in options:
+        options[args[0]] = args[1]
+        args = args[2:]
+    if len(args) < 1 or args[0] in ["-h", "--help"]:
+        print(usage())
+        return
+    command = args[0]
+    if command not in COMMANDS:
+        print(f"wg21: unknown command {command}\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    # Let the script's own argparse see only its arguments
+    sys.argv = [f"wg21 {command}"] + args[1:]
+    module = import_module(COMMANDS[command][0])
+    if options["--metrics"] is None and options["--profile"] is None:
+        module.main()
+        return
+    from instrument import run
+    run(module.main, command, options["--metrics"], options["--profile"])
+
+
+# Call main
+if __name__ == "__main__":
+    main()